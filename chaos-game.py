@@ -1,17 +1,17 @@
 # chaos game (n sided polygon fractal generator)
+import os
 import pygame
 import random
 import math
+import multiprocessing as mp
+import numpy as np
 import tkinter as tk
 from tkinter import simpledialog
 
-# initialize pygame
-pygame.init()
-font = pygame.font.SysFont("Arial", 18)
-# set up display
+# pygame and the window are set up in main(), so worker processes can import this file without opening one
+font = None
+screen = None
 WIDTH, HEIGHT = 800, 600
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Chaos Game")
 # colors
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
@@ -23,57 +23,230 @@ YELLOW = (255, 255, 0)
 n_sides = 3  # number of sides of the polygon
 iterations = 10000  # number of iterations for the chaos game
 fraction = 0.5  # fraction to move towards the vertex
+rule = "any"  # which vertex may be picked next, see RULES
+# points are worked out in blocks: WALKERS independent points each take BLOCK_STEPS steps at once
+WALKERS = 1 << 16
+BLOCK_STEPS = 16
+MAX_ITERATIONS = 500_000_000
+# A keeps adding points to the same hit counts, one block per frame. S saves them here and L picks them back up
+ACCUMULATOR_FILE = "chaos-accumulator.npz"
+# renders are split into tasks of this many points, each with its own random stream, and spread over the pool
+TASK_POINTS = 16_000_000
+PROCESSES = os.cpu_count()
+# walkers of a map that does not shrink never settle, so they get this many steps to try
+MAX_BURN_IN = 100
 # generate vertices of a regular polygon
 
 def draw_polygon(points, color):
     pygame.draw.polygon(screen, color, points, 1)
-def chaos_game(vertices, iterations, fraction):
-    # start with a random point inside the polygon
-    x = random.uniform(0, WIDTH)
-    y = random.uniform(0, HEIGHT)
-    for _ in range(iterations):
-        # choose a random vertex
-        vertex = random.choice(vertices)
-        # move towards the vertex by the fraction
-        x = (1 - fraction) * x + fraction * vertex[0]
-        y = (1 - fraction) * y + fraction * vertex[1]
-        # draw the point
-        screen.set_at((int(x), int(y)), WHITE)
+# an IFS is a stack of affine maps [[a, b, e], [c, d, f]] taking (x, y) to (a x + b y + e, c x + d y + f)
+# plus the odds of picking each map. the polygon chaos game is the maps that move a point towards a vertex
+def polygon_ifs(vertices, fraction):
+    maps = np.zeros((len(vertices), 2, 3))
+    maps[:, 0, 0] = maps[:, 1, 1] = 1 - fraction
+    maps[:, :, 2] = fraction * np.array(vertices, dtype=np.float64)
+    return maps, np.ones(len(vertices))
+
+# the barnsley fern, its maps work in fern units so they are moved into screen pixels first
+def fern_ifs():
+    maps = np.array([
+        [[0.0, 0.0, 0.0], [0.0, 0.16, 0.0]],
+        [[0.85, 0.04, 0.0], [-0.04, 0.85, 1.6]],
+        [[0.2, -0.26, 0.0], [0.23, 0.22, 1.6]],
+        [[-0.15, 0.28, 0.0], [0.26, 0.24, 0.44]],
+    ])
+    to_screen = np.array([[55.0, 0.0, WIDTH / 2], [0.0, -55.0, HEIGHT - 20], [0.0, 0.0, 1.0]])
+    full = np.concatenate([maps, np.tile([[[0.0, 0.0, 1.0]]], (len(maps), 1, 1))], axis=1)
+    return (to_screen @ full @ np.linalg.inv(to_screen))[:, :2], np.array([0.01, 0.85, 0.07, 0.07])
+
+# rules that need to remember each walker's last pick, a rule marks the picks it does not allow
+def no_repeat(last, pick, n):
+    return pick == last
+
+def not_next_to_last(last, pick, n):
+    return ((pick - last) % n == 1) | ((last - pick) % n == 1)
+
+RULES = {"any": None, "no repeat": no_repeat, "not next to last": not_next_to_last}
+
+# picks a map for every walker, picks a rule forbids are drawn again until none are left
+# even odds skip rng.choice, which is a lot slower than rng.integers
+def pick_maps(rng, odds, last, rule):
+    n = len(odds)
+    draw = (lambda size: rng.integers(n, size=size)) if np.all(odds == odds[0]) else (lambda size: rng.choice(n, size=size, p=odds))
+    pick = draw(len(last))
+    forbidden = RULES[rule]
+    while forbidden is not None:
+        redo = np.flatnonzero(forbidden(last, pick, n) & (last >= 0))
+        if not len(redo):
+            break
+        pick[redo] = draw(len(redo))
+    return pick
+
+# steps until any start on the screen is within half a pixel of the attractor,
+# the points before that are just the walk in from the start and are thrown away
+def burn_in(contraction):
+    if contraction >= 1:
+        return MAX_BURN_IN
+    if contraction <= 0:
+        return 1
+    return min(MAX_BURN_IN, math.ceil(math.log(0.5 / max(WIDTH, HEIGHT)) / math.log(contraction)))
+
+# yields the flat pixel index (y * WIDTH + x) of every point that lands on the screen, a block at a time
+# with iterations=None it never stops, that is what the accumulation mode pulls from
+def ifs_blocks(maps, weights, iterations, rule="any", rng=None):
+    rng = rng or np.random.default_rng()
+    odds = np.asarray(weights, dtype=np.float64) / np.sum(weights)
+    (a, b, e), (c, d, f) = np.asarray(maps, dtype=np.float64).transpose(1, 2, 0)
+    walkers = WALKERS if iterations is None else min(WALKERS, iterations)
+    # start with a random point for every walker
+    x = rng.uniform(0, WIDTH, walkers)
+    y = rng.uniform(0, HEIGHT, walkers)
+    last = np.full(walkers, -1)
+    for _ in range(burn_in(max(np.linalg.norm(m[:, :2], 2) for m in maps))):
+        last = pick_maps(rng, odds, last, rule)
+        x, y = a[last] * x + b[last] * y + e[last], c[last] * x + d[last] * y + f[last]
+    left = iterations
+    while left is None or left > 0:
+        steps = BLOCK_STEPS if left is None else min(BLOCK_STEPS, -(-left // walkers))
+        flat = np.empty((steps, walkers), dtype=np.int64)
+        for i in range(steps):
+            last = pick_maps(rng, odds, last, rule)
+            x, y = a[last] * x + b[last] * y + e[last], c[last] * x + d[last] * y + f[last]
+            inside = (x >= 0) & (x < WIDTH) & (y >= 0) & (y < HEIGHT)
+            flat[i] = np.where(inside, y.astype(np.int64) * WIDTH + x.astype(np.int64), -1)
+        flat = flat.reshape(-1)[:left]
+        if left is not None:
+            left -= len(flat)
+        yield flat[flat >= 0]
+
+def chaos_blocks(vertices, iterations, fraction, rng=None):
+    return ifs_blocks(*polygon_ifs(vertices, fraction), iterations, rng=rng)
+
+def count_hits(blocks):
+    hits = np.zeros(WIDTH * HEIGHT, dtype=np.int64)
+    for flat in blocks:
+        hits += np.bincount(flat, minlength=WIDTH * HEIGHT)
+    return hits
+
+def _task_hits(task):
+    maps, weights, points, rule, seed = task
+    return count_hits(ifs_blocks(maps, weights, points, rule, np.random.default_rng(seed)))
+
+# how many points landed on each pixel, as a flat WIDTH * HEIGHT array. with a pool the points are split
+# into tasks that each get an independent stream spawned from one SeedSequence, and the per task
+# histograms are summed as they come back
+def chaos_game(maps, weights, iterations, rule="any", pool=None, seed=None):
+    sizes = [TASK_POINTS] * (iterations // TASK_POINTS) + ([iterations % TASK_POINTS] if iterations % TASK_POINTS else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(maps, weights, n, rule, s) for n, s in zip(sizes, seeds)]
+    if pool is None or len(tasks) == 1:
+        return sum(map(_task_hits, tasks))
+    hits = np.zeros(WIDTH * HEIGHT, dtype=np.int64)
+    for part in pool.imap_unordered(_task_hits, tasks):
+        hits += part
+    return hits
+
+# every pixel that was hit goes white, all in one blit. with density on the brightness follows
+# log(1 + hits) instead, otherwise the few pixels near the vertices wash out everything else
+def draw_points(hits, surface, density=False):
+    hits = hits.reshape(HEIGHT, WIDTH).T
+    if density:
+        lit = (np.log1p(hits) * (255 / np.log1p(max(int(hits.max()), 1)))).astype(np.uint8)
+    else:
+        lit = (hits > 0).astype(np.uint8) * 255
+    pygame.surfarray.blit_array(surface, np.repeat(lit[:, :, None], 3, axis=2))
+
+def save_accumulator(path, hits, maps, weights, rule):
+    tmp = path[:-4] + ".tmp.npz"
+    np.savez_compressed(tmp, hits=hits, maps=maps, weights=weights, rule=rule)
+    os.replace(tmp, path)
+
+# the saved hit counts, or None when they belong to a different fractal
+def load_accumulator(path, maps, weights, rule):
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as saved:
+        same = (np.array_equal(saved["maps"], maps) and np.array_equal(saved["weights"], weights)
+                and str(saved["rule"]) == rule and saved["hits"].shape == (WIDTH * HEIGHT,))
+        return saved["hits"].astype(np.int64) if same else None
 def ask_input():
-    global n_sides, iterations, fraction
+    global n_sides, iterations, fraction, rule
     root = tk.Tk()
     root.withdraw()  # hide the main window
     n_sides = simpledialog.askinteger("Input", "Number of sides of the polygon (3-10):", minvalue=3, maxvalue=10)
-    iterations = simpledialog.askinteger("Input", "Number of iterations for the chaos game (1000-100000):", minvalue=1000, maxvalue=100000)
+    iterations = simpledialog.askinteger("Input", f"Number of iterations for the chaos game (1000-{MAX_ITERATIONS}):", minvalue=1000, maxvalue=MAX_ITERATIONS)
     fraction = simpledialog.askfloat("Input", "Fraction to move towards the vertex (0.1-0.9):", minvalue=0.1, maxvalue=0.9)
+    names = list(RULES)
+    choices = ", ".join(f"{i}: {name}" for i, name in enumerate(names))
+    rule = names[simpledialog.askinteger("Input", f"Vertex rule ({choices}):", minvalue=0, maxvalue=len(names) - 1)]
+    root.destroy()
 def main():
+    global font, screen
     running = True
     vertices = []
 
     # user input for sides, iterations, and fraction (use a tkinter dialog)
     ask_input()
 
+    # start the workers before pygame, SDL's signal handlers would stop terminate() from reaching them
+    pool = mp.Pool(PROCESSES)
+    # initialize pygame
+    pygame.init()
+    font = pygame.font.SysFont("Arial", 18)
+    # set up display
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Chaos Game")
 
     for i in range(n_sides):
         angle = 2 * math.pi * i / n_sides
         x = WIDTH // 2 + 200 * math.cos(angle)
         y = HEIGHT // 2 + 200 * math.sin(angle)
         vertices.append((x, y))
+    # the points only change on R, every other frame just blits them back
+    # unless accumulating, then every frame adds another block to the hits
+    # F swaps the polygon for the fern and back
+    fern = False
+    maps, weights = polygon_ifs(vertices, fraction)
+    points = pygame.Surface((WIDTH, HEIGHT))
+    hits = chaos_game(maps, weights, iterations, rule, pool)
+    draw_points(hits, points)
+    accumulate = False
+    blocks = None
     while running:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
             if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_r:  # reset the game
-                    screen.fill(BLACK)
-                    draw_polygon(vertices, RED)
-                    chaos_game(vertices, iterations, fraction)
-                    pygame.display.flip()
-                
-        screen.fill(BLACK)
-        draw_polygon(vertices, random.choice([RED, GREEN, BLUE, YELLOW]))
-        chaos_game(vertices, iterations, fraction)
+                if event.key in (pygame.K_r, pygame.K_f):  # reset the game
+                    if event.key == pygame.K_f:
+                        fern = not fern
+                        maps, weights = fern_ifs() if fern else polygon_ifs(vertices, fraction)
+                    hits = chaos_game(maps, weights, iterations, rule, pool)
+                    blocks = None
+                    draw_points(hits, points, accumulate)
+                elif event.key == pygame.K_a:  # toggle accumulating
+                    accumulate = not accumulate
+                    draw_points(hits, points, accumulate)
+                elif event.key == pygame.K_s:
+                    save_accumulator(ACCUMULATOR_FILE, hits, maps, weights, rule)
+                elif event.key == pygame.K_l:
+                    saved = load_accumulator(ACCUMULATOR_FILE, maps, weights, rule)
+                    if saved is not None:
+                        hits, accumulate = saved, True
+                        draw_points(hits, points, accumulate)
+
+        if accumulate:
+            if blocks is None:
+                blocks = ifs_blocks(maps, weights, None, rule)
+            hits += np.bincount(next(blocks), minlength=WIDTH * HEIGHT)
+            draw_points(hits, points, True)
+        screen.blit(points, (0, 0))
+        if not fern:
+            draw_polygon(vertices, random.choice([RED, GREEN, BLUE, YELLOW]))
+        if accumulate:
+            screen.blit(font.render(f"{int(hits.sum()):,} points  (A: stop, S: save, L: load)", True, WHITE), (10, 10))
         pygame.display.flip()
+    pool.terminate()
     pygame.quit()
 
 if __name__ == "__main__":
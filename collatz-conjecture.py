@@ -1,4 +1,31 @@
 # simple program to test the collatz conjecture
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing as mp
+import numpy as np
+
+# batch mode works out the stopping time (steps to reach 1) and the highest value on the way for whole ranges.
+# results for values below CACHE_LIMIT are kept, so a walk stops as soon as it drops under what is known
+CACHE_LIMIT = 1 << 21
+# starting values stepped together as one vector
+BLOCK = 1 << 18
+# 3v + 1 still fits in an int64 up to here, walks that climb past it are finished with python ints
+SAFE_LIMIT = (2 ** 63 - 2) // 3
+# stands in for a peak too big for int64, the real one is kept on the side
+BIG_PEAK = np.iinfo(np.int64).max
+# results file: 4 int64 header (magic, records only, start, stop) then one RESULT per number
+RESULTS_MAGIC = 0x434F4C4C
+RESULT = np.dtype([("n", "<u8"), ("steps", "<u4"), ("peak_hi", "<u8"), ("peak_lo", "<u8")])
+# the sweep only walks numbers whose last SIEVE_BITS bits don't already prove they drop below themselves
+SIEVE_BITS = 20
+# numbers per task handed to the pool, the checkpoint is saved after each one
+SWEEP_CHUNK = 1 << 24
+SWEEP_CHECKPOINT = "collatz-sweep.json"
+# a walk this long without dropping below its start is reported instead of followed forever
+MAX_GLIDE = 100_000
 
 def collatz(n):
     if n % 2 == 0:
@@ -6,19 +33,373 @@ def collatz(n):
     else:
         return 3 * n + 1
 def test_collatz(n):
+    # printing the terms one by one is slower than working them out, so they go out in one write
+    terms = []
     while n != 1:
-        print(n, end=' ')
+        terms.append(str(n))
         n = collatz(n)
+    if terms:
+        print(" ".join(terms), end=" ")
     print("Conjecture holds for this number.")
-# test the function with a few numbers
-
-while True:
-    testnum = str(input("Enter a number to test the Collatz conjecture. Enter STOP to quit: "))
-    if testnum.upper() == "STOP":
-        break
-    elif testnum.isdigit():
-        test_collatz(int(testnum))
-    else:
-        print("Please enter a valid number or STOP to quit.")
 
+# steps and peaks for every value below `known`, filled in a block at a time from 2 upwards
+class StoppingTimes:
+    def __init__(self, limit=CACHE_LIMIT):
+        self.limit = max(limit, 2)
+        self.steps = np.zeros(self.limit, dtype=np.int64)
+        self.peaks = np.ones(self.limit, dtype=np.int64)
+        self.known = 2
+
+    def fill(self, upto):
+        upto = min(upto, self.limit)
+        while self.known < upto:
+            stop = min(upto, self.known + BLOCK)
+            steps, peaks, _ = self.walk(np.arange(self.known, stop, dtype=np.int64))
+            self.steps[self.known:stop] = steps
+            self.peaks[self.known:stop] = peaks
+            self.known = stop
+
+    # steps every start until it drops below `known`, then adds on the cached rest of its walk.
+    # an odd step goes straight on to the halving after it, (3v + 1) / 2 counted as two steps.
+    # returns steps, peaks and {index: peak} for the peaks that went past int64
+    def walk(self, starts):
+        steps = np.zeros(len(starts), dtype=np.int64)
+        peaks = np.empty(len(starts), dtype=np.int64)
+        big = {}
+        # only the walks still going are kept, with where their results go
+        lane = np.arange(len(starts))
+        v = starts.copy()
+        s = np.zeros(len(starts), dtype=np.int64)
+        p = starts.copy()
+        while len(v):
+            done = v < self.known
+            huge = v > SAFE_LIMIT
+            if done.any() or huge.any():
+                idx, w = lane[done], v[done]
+                steps[idx] = s[done] + self.steps[w]
+                peaks[idx] = np.maximum(p[done], self.peaks[w])
+                for i, w, si, pi in zip(lane[huge].tolist(), v[huge].tolist(), s[huge].tolist(), p[huge].tolist()):
+                    extra, peak = self.walk_int(w)
+                    steps[i] = si + extra
+                    peaks[i] = BIG_PEAK
+                    big[i] = max(pi, peak)
+                keep = ~(done | huge)
+                lane, v, s, p = lane[keep], v[keep], s[keep], p[keep]
+            odd = v & 1
+            v = np.where(odd == 1, 3 * v + 1, v)
+            np.maximum(p, v, out=p)
+            v >>= 1
+            s += 1 + odd
+        return steps, peaks, big
+
+    def walk_int(self, v):
+        steps, peak = 0, v
+        while v >= self.known:
+            if v & 1:
+                v = 3 * v + 1
+                peak = max(peak, v)
+                v >>= 1
+                steps += 2
+            else:
+                v >>= 1
+                steps += 1
+        return steps + int(self.steps[v]), max(peak, int(self.peaks[v]))
+
+    # yields (starts, steps, peaks, big) a block at a time for start <= n < stop
+    def results(self, start, stop):
+        self.fill(stop)
+        while start < stop:
+            end = min(stop, start + BLOCK)
+            starts = np.arange(start, end, dtype=np.int64)
+            if end <= self.known:
+                yield starts, self.steps[start:end], self.peaks[start:end], {}
+            else:
+                yield (starts, *self.walk(starts))
+            start = end
+
+# indices of the numbers that take more steps or climb higher than any before them, and the new bests.
+# the vector check is exact apart from big peaks, so only the few candidates it leaves are looked at one by one
+def record_holders(steps, peaks, big, best_steps, best_peak):
+    before_steps = np.maximum.accumulate(np.concatenate([[best_steps], steps]))[:-1]
+    before_peaks = np.maximum.accumulate(np.concatenate([[min(best_peak, BIG_PEAK)], peaks]))[:-1]
+    chosen = []
+    for i in np.flatnonzero((steps > before_steps) | (peaks > before_peaks) | (peaks == BIG_PEAK)).tolist():
+        peak = big.get(i, int(peaks[i]))
+        if steps[i] > best_steps or peak > best_peak:
+            chosen.append(i)
+            best_steps, best_peak = max(best_steps, int(steps[i])), max(best_peak, peak)
+    return np.array(chosen, dtype=np.int64), best_steps, best_peak
+
+def to_results(starts, steps, peaks, big, chosen=None):
+    if chosen is None:
+        chosen = np.arange(len(starts))
+    out = np.empty(len(chosen), dtype=RESULT)
+    out["n"] = starts[chosen]
+    out["steps"] = steps[chosen]
+    out["peak_hi"] = 0
+    out["peak_lo"] = peaks[chosen]
+    for k, i in enumerate(chosen.tolist()):
+        if i in big:
+            out["peak_hi"][k], out["peak_lo"][k] = big[i] >> 64, big[i] & (2 ** 64 - 1)
+    return out
+
+def peak_of(result):
+    return (int(result["peak_hi"]) << 64) | int(result["peak_lo"])
+
+# checks start <= n < stop and writes a result for every number, or only for the record holders.
+# returns the longest and highest results seen
+def verify_range(start, stop, path, records_only=False, cache_limit=CACHE_LIMIT, log=sys.stderr):
+    cache = StoppingTimes(cache_limit)
+    best_steps, best_peak = -1, 0
+    longest = highest = None
+    begin = time.time()
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.array([RESULTS_MAGIC, int(records_only), start, stop], dtype="<i8").tofile(f)
+        for starts, steps, peaks, big in cache.results(start, stop):
+            chosen, best_steps, best_peak = record_holders(steps, peaks, big, best_steps, best_peak)
+            records = to_results(starts, steps, peaks, big, chosen)
+            for r in records:
+                if longest is None or r["steps"] > longest["steps"]:
+                    longest = r
+                if highest is None or peak_of(r) > peak_of(highest):
+                    highest = r
+            (records if records_only else to_results(starts, steps, peaks, big)).tofile(f)
+            done = int(starts[-1]) + 1 - start
+            log.write("%d numbers (%.3g numbers/s)\n" % (done, done / max(time.time() - begin, 1e-9)))
+    os.replace(tmp, path)
+    return longest, highest
+
+def read_results(path):
+    header = np.fromfile(path, dtype="<i8", count=4)
+    if len(header) < 4 or header[0] != RESULTS_MAGIC:
+        raise ValueError(f"{path} is not a collatz results file")
+    return bool(header[1]), int(header[2]), int(header[3]), np.fromfile(path, dtype=RESULT, offset=header.nbytes)
+
+# sweep mode proves the conjecture for a range instead of measuring it. with everything below n known to
+# reach 1, n only has to drop below itself. write n = 2^k q + r, after i steps (with j of them odd) it is
+# 3^j 2^(k-i) q + T^i(r) whatever q is, so the last k bits alone can show it drops for every q >= 1.
+# the residues where they can't are the only ones walked, starting from step k
+def build_sieve(bits):
+    r = np.arange(1 << bits, dtype=np.int64)
+    b = r.copy()
+    j = np.zeros(1 << bits, dtype=np.int64)
+    alive = np.ones(1 << bits, dtype=bool)
+    for i in range(1, bits + 1):
+        odd = b & 1
+        b = np.where(odd == 1, (3 * b + 1) >> 1, b >> 1)
+        j += odd
+        a = np.power(3, j) << (bits - i)
+        # a q + b < 2^k q + r for every q >= 1 exactly when it holds at q = 1
+        alive &= ~((a < 1 << bits) & (a + b < (1 << bits) + r))
+    keep = np.flatnonzero(alive)
+    return keep, np.power(3, j[keep]), b[keep], j[keep]
+
+# each worker builds the sieve once
+_sieves = {}
+def sieve(bits):
+    if bits not in _sieves:
+        _sieves[bits] = build_sieve(bits)
+    return _sieves[bits]
 
+# steps taken until v drops below n, or None past MAX_GLIDE
+def glide_int(n, v, steps=0):
+    while v >= n:
+        if steps > MAX_GLIDE:
+            return None
+        if v & 1:
+            v = (3 * v + 1) >> 1
+            steps += 2
+        else:
+            v >>= 1
+            steps += 1
+    return steps
+
+# walks every v until it drops below its n, s is the steps already taken. returns the longest glide,
+# the n it belongs to, and the n of any walk that went past MAX_GLIDE
+def descend(n, v, s):
+    best, best_n, suspects = -1, None, []
+    while len(v):
+        done = v < n
+        huge = (v > SAFE_LIMIT) | (s > MAX_GLIDE)
+        if done.any() or huge.any():
+            if done.any():
+                i = int(np.argmax(s[done]))
+                if s[done][i] > best:
+                    best, best_n = int(s[done][i]), int(n[done][i])
+            for nn, vv, ss in zip(n[huge].tolist(), v[huge].tolist(), s[huge].tolist()):
+                steps = glide_int(nn, vv, ss)
+                if steps is None:
+                    suspects.append(nn)
+                elif steps > best:
+                    best, best_n = steps, nn
+            keep = ~(done | huge)
+            n, v, s = n[keep], v[keep], s[keep]
+        odd = v & 1
+        v = np.where(odd == 1, 3 * v + 1, v) >> 1
+        s += 1 + odd
+    return best, best_n, suspects
+
+# checks lo <= n < hi, returns (lo, hi, numbers walked, longest glide, its n, suspects)
+def _sweep_chunk(task):
+    lo, hi, bits = task
+    residues, a, b, j = sieve(bits)
+    low = range(max(lo, 2), min(hi, 1 << bits))
+    first = max(lo, 1 << bits)
+    blocks = range(first >> bits, ((hi - 1) >> bits) + 1) if first < hi else range(0)
+    # the starts and where the walks pick up after the first k steps have to fit in int64, else python ints
+    if hi <= SAFE_LIMIT and ((hi >> bits) + 1) * 3 ** bits <= SAFE_LIMIT:
+        q = np.arange(blocks.start, blocks.stop, dtype=np.int64)
+        n = ((q[:, None] << bits) + residues).ravel()
+        v = (q[:, None] * a + b).ravel()
+        s = np.broadcast_to(bits + j, (len(q), len(j))).ravel()
+        inside = (n >= first) & (n < hi)
+        n = np.concatenate([np.arange(low.start, low.stop, dtype=np.int64), n[inside]])
+        v = np.concatenate([np.arange(low.start, low.stop, dtype=np.int64), v[inside]])
+        s = np.concatenate([np.zeros(len(low), dtype=np.int64), s[inside]])
+        return (lo, hi, len(n)) + descend(n, v, s)
+    sieved = list(zip(residues.tolist(), a.tolist(), b.tolist(), j.tolist()))
+    def starts():
+        for n in low:
+            yield n, n, 0
+        for q in blocks:
+            for r, mul, add, odd in sieved:
+                if first <= (q << bits) + r < hi:
+                    yield (q << bits) + r, q * mul + add, bits + odd
+    best, best_n, suspects, walked = -1, None, [], 0
+    for n, v, steps in starts():
+        steps = glide_int(n, v, steps)
+        if steps is None:
+            suspects.append(n)
+        elif steps > best:
+            best, best_n = steps, n
+        walked += 1
+    return lo, hi, walked, best, best_n, suspects
+
+def save_sweep(path, state):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=1)
+    os.replace(tmp, path)
+
+def load_sweep(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+# a saved sweep is only picked up again from the same start with the same sieve, its stop can be
+# different so a finished sweep can be pushed further. a different one is never written over unless fresh
+def mismatch(state, start, bits):
+    if state is None or (state["start"] == start and state["sieve_bits"] == bits):
+        return None
+    return "it holds a sweep from %d with --sieve-bits %d, rerun with those or pass --fresh to start over" % (
+        state["start"], state["sieve_bits"])
+
+# proves every number in start <= n < stop reaches 1, taking for granted that everything below start does.
+# the range is cut into chunks spread over a pool, and the checkpoint is saved every time the next chunk
+# in order is done, so an interrupted sweep picks up from there
+def sweep(start, stop, bits=SIEVE_BITS, chunk=SWEEP_CHUNK, processes=None, checkpoint=SWEEP_CHECKPOINT, fresh=False,
+          log=sys.stderr):
+    state = None if fresh else load_sweep(checkpoint)
+    problem = mismatch(state, start, bits)
+    if problem:
+        raise ValueError(f"{checkpoint}: {problem}")
+    state = state or {
+        "start": start, "sieve_bits": bits, "next": start, "walked": 0, "longest_glide": [-1, None], "suspects": [],
+    }
+    state["stop"] = stop
+    if state["next"] > start:
+        log.write("resuming from %d\n" % state["next"])
+    tasks = [(lo, min(lo + chunk, stop), bits) for lo in range(state["next"], stop, chunk)]
+    processes = min(processes or os.cpu_count(), max(len(tasks), 1))
+    pool = mp.Pool(processes) if processes != 1 else None
+    # on ctrl-c or an error the workers are stopped too, the checkpoint already has every finished chunk
+    try:
+        parts = pool.imap(_sweep_chunk, tasks) if pool else map(_sweep_chunk, tasks)
+        begin = time.time()
+        walked_now = 0
+        for lo, hi, walked, glide, n, suspects in parts:
+            state["next"] = hi
+            state["walked"] += walked
+            if glide > state["longest_glide"][0]:
+                state["longest_glide"] = [glide, n]
+            state["suspects"] += suspects
+            save_sweep(checkpoint, state)
+            walked_now += walked
+            elapsed = max(time.time() - begin, 1e-9)
+            log.write("up to %d  %.3g numbers/s  (%.3g walked/s, the rest sieved out)  %d suspects\n"
+                      % (hi, (hi - tasks[0][0]) / elapsed, walked_now / elapsed, len(state["suspects"])))
+    finally:
+        if pool:
+            pool.terminate()
+            pool.join()
+    return state
+
+# plain integers or things like 1e9
+def number(text):
+    try:
+        return int(text)
+    except ValueError:
+        return int(float(text))
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Collatz conjecture, run without arguments to test numbers one at a time")
+    parser.add_argument("--start", type=number, default=1)
+    parser.add_argument("--stop", type=number, required=True, help="numbers below this are checked, e.g. 1e9")
+    parser.add_argument("--records", action="store_true", help="only write the numbers that set a new stopping time or peak")
+    parser.add_argument("--cache", type=number, default=CACHE_LIMIT, help="keep results for values below this")
+    parser.add_argument("--out", default="collatz-results.bin")
+    parser.add_argument("--sweep", action="store_true",
+                        help="only prove the range reaches 1, taking numbers below start as known. no size limit, resumes from --checkpoint")
+    parser.add_argument("--sieve-bits", type=int, default=SIEVE_BITS, choices=range(1, 27), metavar="1-26")
+    parser.add_argument("--chunk", type=number, default=SWEEP_CHUNK, help="numbers per worker task")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--checkpoint", default=SWEEP_CHECKPOINT)
+    parser.add_argument("--fresh", action="store_true", help="start the sweep over, replacing a saved one that doesn't match")
+    args = parser.parse_args(argv)
+    if not 1 <= args.start <= args.stop or (not args.sweep and args.stop > 2 ** 63 - 1):
+        parser.error("need 1 <= start <= stop, and stop < 2**63 without --sweep")
+    if args.sweep and not args.fresh:
+        problem = mismatch(load_sweep(args.checkpoint), args.start, args.sieve_bits)
+        if problem:
+            parser.error(f"{args.checkpoint}: {problem}")
+    return args
+
+def cli(argv):
+    args = parse_args(argv)
+    begin = time.time()
+    if args.sweep:
+        state = sweep(args.start, args.stop, args.sieve_bits, args.chunk, args.workers, args.checkpoint, args.fresh)
+        elapsed = max(time.time() - begin, 1e-9)
+        print("every number below %d reaches 1%s" % (state["next"], " if those below %d do" % args.start if args.start > 1 else ""))
+        print("walked %d numbers, the longest took %d steps to drop below itself (%s)"
+              % (state["walked"], state["longest_glide"][0], state["longest_glide"][1]))
+        if state["suspects"]:
+            print("went past %d steps without dropping: %s" % (MAX_GLIDE, " ".join(map(str, state["suspects"]))))
+        return
+    longest, highest = verify_range(args.start, args.stop, args.out, args.records, args.cache)
+    elapsed = max(time.time() - begin, 1e-9)
+    print("checked %d numbers in %.2fs (%.3g numbers/s)" % (args.stop - args.start, elapsed, (args.stop - args.start) / elapsed))
+    if longest is not None:
+        print("longest: %d takes %d steps" % (longest["n"], longest["steps"]))
+        print("highest: %d climbs to %d" % (highest["n"], peak_of(highest)))
+
+def main():
+    while True:
+        try:
+            testnum = input("Enter a number to test the Collatz conjecture. Enter STOP to quit: ")
+        except EOFError:
+            break
+        if testnum.upper() == "STOP":
+            break
+        elif testnum.isdigit() and int(testnum) > 0:
+            test_collatz(int(testnum))
+        else:
+            print("Please enter a valid number or STOP to quit.")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        cli(sys.argv[1:])
+    else:
+        main()
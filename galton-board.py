@@ -1,4 +1,10 @@
-import random
+import os
+import sys
+import math
+import time
+import argparse
+import multiprocessing as mp
+import numpy as np
 import pygame as pg
 
 # constants
@@ -10,6 +16,8 @@ NUM_BALLS = 200
 BIN_WIDTH = WIDTH // (NUM_PEG_ROWS + 1)
 PROBABILITY_LEFT = 0.5
 BALL_SPEED = 5  # pixels per frame for smoother animation
+# the headless sampler hands out balls to the workers in chunks of this size
+CHUNK_BALLS = 10_000_000
 
 # colors
 WHITE = (255, 255, 255)
@@ -19,31 +27,176 @@ BLUE = (0, 0, 255)
 # vertical spacing between peg rows
 ROW_SPACING = (HEIGHT - 150) // (NUM_PEG_ROWS + 1)  # leave space for bins
 
-class Ball:
-    def __init__(self):
-        self.x = WIDTH // 2
-        self.y = BALL_RADIUS
-        self.peg = 0
-        self.finished = False
-        self.target_x = self.x
+# every ball lives in a few arrays instead of its own object, so one frame is a handful of
+# numpy operations no matter how many balls there are. a ball that went right k times ends
+# up in bin k. once a ball finishes it is dropped from the arrays and only counted in its bin,
+# so the histogram is updated with just the balls that finished this frame
+class Balls:
+    def __init__(self, count, rng=None):
+        self.rng = rng or np.random.default_rng()
+        self.x = np.full(count, WIDTH // 2, dtype=np.int32)
+        self.y = np.full(count, BALL_RADIUS, dtype=np.int32)
         self.target_y = self.y + ROW_SPACING
+        self.peg = np.zeros(count, dtype=np.int32)
+        self.rights = np.zeros(count, dtype=np.int32)
+        self.bins = np.zeros(NUM_PEG_ROWS + 1, dtype=np.int64)
+        self.finished_y = None  # where the finished balls came to rest
+
+    def falling(self):
+        return len(self.x)
 
     def fall_step(self):
-        if self.peg >= NUM_PEG_ROWS:
-            self.finished = True
-            return
+        finished = self.peg >= NUM_PEG_ROWS
+        if finished.any():
+            self.bins += np.bincount(self.rights[finished], minlength=NUM_PEG_ROWS + 1)
+            self.finished_y = int(self.y[finished][0])
+            keep = ~finished
+            self.x, self.y, self.target_y = self.x[keep], self.y[keep], self.target_y[keep]
+            self.peg, self.rights = self.peg[keep], self.rights[keep]
 
         # move smoothly toward target
-        if self.y < self.target_y:
-            self.y += BALL_SPEED
-        if self.y >= self.target_y:
-            # decide left or right
-            if random.random() < PROBABILITY_LEFT:
-                self.x -= BIN_WIDTH // 2
-            else:
-                self.x += BIN_WIDTH // 2
+        np.add(self.y, BALL_SPEED, out=self.y, where=self.y < self.target_y)
+        bounce = self.y >= self.target_y
+        count = int(np.count_nonzero(bounce))
+        if count == 0:
+            return
+        # decide left or right
+        if count == len(bounce):
+            # balls released together stay in step, so usually it is all of them or none
+            right = self.rng.random(count) >= PROBABILITY_LEFT
+            self.x += np.where(right, BIN_WIDTH // 2, -(BIN_WIDTH // 2)).astype(np.int32)
             self.peg += 1
             self.target_y += ROW_SPACING
+        else:
+            right = np.zeros(len(bounce), dtype=bool)
+            right[bounce] = self.rng.random(count) >= PROBABILITY_LEFT
+            self.x += np.where(right, BIN_WIDTH // 2, np.where(bounce, -(BIN_WIDTH // 2), 0)).astype(np.int32)
+            self.peg += bounce
+            self.target_y += ROW_SPACING * bounce
+        self.rights += right
+
+    # every spot at least one ball is sitting on, each drawn once however many balls share it
+    def occupied(self):
+        spots = np.flatnonzero(np.bincount(np.clip(self.y, 0, HEIGHT - 1) * WIDTH + np.clip(self.x, 0, WIDTH - 1),
+                                           minlength=WIDTH * HEIGHT))
+        xs, ys = spots % WIDTH, spots // WIDTH
+        if self.finished_y is not None:
+            # finished balls all stop at the same height, one per filled bin
+            k = np.flatnonzero(self.bins)
+            xs = np.concatenate([xs, WIDTH // 2 + (2 * k - NUM_PEG_ROWS) * (BIN_WIDTH // 2)])
+            ys = np.concatenate([ys, np.full(len(k), self.finished_y)])
+        return xs, ys
+
+def draw_pegs():
+    surface = pg.Surface((WIDTH, HEIGHT))
+    surface.fill(WHITE)
+    for row in range(NUM_PEG_ROWS):
+        for col in range(row + 1):
+            peg_x = WIDTH // 2 - (row * BIN_WIDTH // 2) + col * BIN_WIDTH
+            peg_y = (row + 1) * ROW_SPACING
+            pg.draw.circle(surface, BLACK, (peg_x, peg_y), PEG_RADIUS)
+    return surface
+
+# headless sampling, no animation. where a ball ends up only depends on how many times it went right,
+# which is binomial(rows, 1 - p_left), so the bins can be drawn directly instead of stepping balls.
+# "binomial" draws every ball, "multinomial" draws the counts of a whole chunk at once
+
+# chance of landing in each bin, in logs so hundreds of rows do not overflow. a term with no bounces
+# that way counts as 0 even when that way can't happen, so p_left of 0 or 1 puts everything in one bin
+def exact_bins(rows=NUM_PEG_ROWS, p_left=PROBABILITY_LEFT):
+    k = np.arange(rows + 1)
+    log_comb = np.array([math.lgamma(rows + 1) - math.lgamma(i + 1) - math.lgamma(rows - i + 1) for i in k])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rights = np.where(k == 0, 0, k * np.log(1 - p_left))
+        lefts = np.where(k == rows, 0, (rows - k) * np.log(p_left))
+    return np.exp(log_comb + rights + lefts)
+
+def _sample_chunk(task):
+    count, rows, p_left, method, seed = task
+    rng = np.random.default_rng(seed)
+    if method == "multinomial":
+        return rng.multinomial(count, exact_bins(rows, p_left))
+    return np.bincount(rng.binomial(rows, 1 - p_left, size=count), minlength=rows + 1)
+
+# yields (balls so far, running bin counts) after every chunk. each chunk gets its own stream
+# spawned from one SeedSequence, so a seed gives the same totals however many workers there are
+def sample_bins(balls, rows=NUM_PEG_ROWS, p_left=PROBABILITY_LEFT, method="multinomial", processes=None, seed=None):
+    sizes = [CHUNK_BALLS] * (balls // CHUNK_BALLS) + ([balls % CHUNK_BALLS] if balls % CHUNK_BALLS else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(n, rows, p_left, method, s) for n, s in zip(sizes, seeds)]
+    processes = min(processes or os.cpu_count(), max(len(tasks), 1))
+    pool = mp.Pool(processes) if processes != 1 else None
+    # the workers are stopped on an error, ctrl-c, or a caller that stops taking totals early
+    try:
+        parts = pool.imap(_sample_chunk, tasks) if pool else map(_sample_chunk, tasks)
+        bins = np.zeros(rows + 1, dtype=np.int64)
+        done = 0
+        for size, part in zip(sizes, parts):
+            bins += part
+            done += size
+            yield done, bins
+    finally:
+        if pool:
+            pool.terminate()
+            pool.join()
+
+# upper tail of the chi-square distribution, via the wilson-hilferty normal approximation
+def chi2_tail(stat, dof):
+    if dof <= 0:
+        return 1.0
+    z = ((stat / dof) ** (1 / 3) - (1 - 2 / (9 * dof))) / math.sqrt(2 / (9 * dof))
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+# chi-square test and total variation distance against the exact binomial. bins expecting fewer
+# than 5 balls are lumped together so the chi-square approximation holds
+def compare_bins(bins, rows=NUM_PEG_ROWS, p_left=PROBABILITY_LEFT):
+    total = bins.sum()
+    exact = exact_bins(rows, p_left)
+    expected = exact * total
+    big = expected >= 5
+    observed = np.append(bins[big], bins[~big].sum())
+    expected = np.append(expected[big], expected[~big].sum())
+    if expected[-1] == 0:
+        observed, expected = observed[:-1], expected[:-1]
+    chi2 = float(((observed - expected) ** 2 / expected).sum())
+    dof = len(expected) - 1
+    return {
+        "chi2": chi2,
+        "dof": dof,
+        "p_value": chi2_tail(chi2, dof),
+        "total_variation": float(0.5 * np.abs(bins / total - exact).sum()),
+    }
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Galton board, run without arguments for the window")
+    parser.add_argument("--balls", type=lambda text: int(float(text)), default=NUM_BALLS, help="number of balls, e.g. 1e9")
+    parser.add_argument("--rows", type=int, default=NUM_PEG_ROWS)
+    parser.add_argument("--p-left", type=float, default=PROBABILITY_LEFT)
+    parser.add_argument("--method", choices=["multinomial", "binomial"], default="multinomial",
+                        help="draw whole chunks of counts at once, or every ball on its own")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+    if args.balls < 1:
+        parser.error("--balls must be at least 1")
+    if args.rows < 1:
+        parser.error("--rows must be at least 1")
+    if not 0 <= args.p_left <= 1:
+        parser.error("--p-left must be between 0 and 1")
+    return args
+
+def cli(argv, log=sys.stderr):
+    args = parse_args(argv)
+    start = time.time()
+    for done, bins in sample_bins(args.balls, args.rows, args.p_left, args.method, args.workers, args.seed):
+        stats = compare_bins(bins, args.rows, args.p_left)
+        elapsed = max(time.time() - start, 1e-9)
+        log.write("%d balls (%.3g balls/s)  total variation %.3g\n" % (done, done / elapsed, stats["total_variation"]))
+    exact = exact_bins(args.rows, args.p_left)
+    print("bin  count  observed  exact")
+    for k, count in enumerate(bins.tolist()):
+        print("%d  %d  %.6g  %.6g" % (k, count, count / args.balls, exact[k]))
+    print("chi2 %.4g  dof %d  p %.4g  total variation %.4g" % (stats["chi2"], stats["dof"], stats["p_value"], stats["total_variation"]))
 
 def main():
     pg.init()
@@ -51,8 +204,9 @@ def main():
     pg.display.set_caption("Galton Board Simulation")
     clock = pg.time.Clock()
 
-    balls = [Ball() for _ in range(NUM_BALLS)]
-    bins = [0 for _ in range(NUM_PEG_ROWS + 1)]
+    balls = Balls(NUM_BALLS)
+    # the pegs never change, so they are drawn once and blitted back every frame
+    pegs = draw_pegs()
 
     running = True
     while running:
@@ -60,33 +214,18 @@ def main():
             if event.type == pg.QUIT:
                 running = False
 
-        screen.fill(WHITE)
-
-        # draw pegs
-        for row in range(NUM_PEG_ROWS):
-            for col in range(row + 1):
-                peg_x = WIDTH // 2 - (row * BIN_WIDTH // 2) + col * BIN_WIDTH
-                peg_y = (row + 1) * ROW_SPACING
-                pg.draw.circle(screen, BLACK, (peg_x, peg_y), PEG_RADIUS)
+        screen.blit(pegs, (0, 0))
 
         # move and draw balls
-        for ball in balls:
-            if not ball.finished:
-                ball.fall_step()
-            pg.draw.circle(screen, BLUE, (int(ball.x), int(ball.y)), BALL_RADIUS)
-
-        # update bins
-        bins = [0 for _ in range(NUM_PEG_ROWS + 1)]
-        for ball in balls:
-            if ball.finished:
-                idx = int((ball.x + BIN_WIDTH // 2) // BIN_WIDTH)
-                idx = max(0, min(NUM_PEG_ROWS, idx))
-                bins[idx] += 1
+        balls.fall_step()
+        for x, y in zip(*balls.occupied()):
+            pg.draw.circle(screen, BLUE, (int(x), int(y)), BALL_RADIUS)
 
         # draw bins histogram
-        max_bin_height = max(bins) if bins else 1
+        bins = balls.bins
+        max_bin_height = bins.max()
         if max_bin_height > 0:
-            for i, count in enumerate(bins):
+            for i, count in enumerate(bins.tolist()):
                 bin_x = i * BIN_WIDTH
                 bin_height = int((count / max_bin_height) * 150)  # scale relative to max count
                 pg.draw.rect(screen, BLACK, (bin_x, HEIGHT - bin_height, BIN_WIDTH, bin_height))
@@ -97,4 +236,7 @@ def main():
     pg.quit()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if len(sys.argv) > 1:
+        cli(sys.argv[1:])
+    else:
+        main()
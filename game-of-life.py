@@ -1,9 +1,13 @@
 # simple implementation of the game of life in python using pygame
 # just made for fun
 
-import pygame
+import os
+import re
 import sys
-import random
+from array import array
+from itertools import repeat
+import pygame
+import numpy as np
 
 # Configuration
 WIDTH, HEIGHT = 800, 600
@@ -14,6 +18,28 @@ ROWS = HEIGHT // CELL_SIZE
 # speed of the game (frames per second)
 FPS = 10
 
+# generations skipped by one press of J
+JUMP_GENERATIONS = 1024
+# hashlife garbage collects once it holds this many nodes
+HASHLIFE_MAX_NODES = 2_000_000
+
+# the unbounded universe is stored in CHUNK x CHUNK blocks, only blocks that can change are stepped
+CHUNK = 64
+# cells moved by one arrow key press
+PAN_STEP = 10
+# cell sizes the unbounded view can zoom between, all divide the window size
+ZOOM_LEVELS = (1, 2, 5, 10, 20)
+# grid lines are only drawn when cells are bigger than this
+MIN_GRID_LINE_CELL = 4
+# past this fraction of changed cells one full surfarray blit beats drawing cell by cell
+FULL_REDRAW_FRACTION = 0.05
+
+# S saves the live cells here and L loads them back (.rle, or .cells for plaintext)
+PATTERN_FILE = "pattern.rle"
+# while running the board is checkpointed every CHECKPOINT_EVERY generations (0 turns it off)
+CHECKPOINT_FILE = "life-checkpoint.bin"
+CHECKPOINT_EVERY = 1000
+
 # Colors
 BG_COLOR = (10, 10, 10)
 GRID_COLOR = (40, 40, 40)
@@ -24,6 +50,11 @@ instructions = [
 "SPACE: Start/Pause",
 "C: Clear",
 "R: Randomize",
+"J: Jump ahead",
+"U: Toggle unbounded universe",
+"Arrows: Move the view",
+"- / =: Zoom out / in",
+"S / L: Save / load pattern",
 "ESC: Quit",
 "Press ENTER to hide this menu"
 ]
@@ -35,61 +66,774 @@ pygame.display.set_caption("Python - Conway's Game of Life")
 clock = pygame.time.Clock()
 font = pygame.font.SysFont(None, 24)  # Create font once
 
-def create_grid(randomize=False):
+# the board is a ROWS x COLS uint8 array, 1 = alive
+def create_grid(randomize=False, rows=ROWS, cols=COLS):
     if randomize:
-        return [[random.choice([0, 1]) for _ in range(COLS)] for _ in range(ROWS)]
-    return [[0 for _ in range(COLS)] for _ in range(ROWS)]
+        return np.random.randint(0, 2, size=(rows, cols), dtype=np.uint8)
+    return np.zeros((rows, cols), dtype=np.uint8)
 
 grid = create_grid()
 running = False
 
+# keeps the drawn board on its own surface and only touches what changed since the last frame
+# the background with the grid lines is drawn once, a changed cell is either a green fill or a
+# patch of the background blitted back. when a lot changes (or cells are tiny) the whole board
+# goes out in one surfarray blit instead
+class GridRenderer:
+    def __init__(self, rows, cols, cell_size):
+        self.rows, self.cols, self.cell_size = rows, cols, cell_size
+        size = (cols * cell_size, rows * cell_size)
+        self.background = pygame.Surface(size)
+        self.background.fill(BG_COLOR)
+        self.grid_lines = cell_size >= MIN_GRID_LINE_CELL
+        if self.grid_lines:
+            for y in range(rows):
+                for x in range(cols):
+                    pygame.draw.rect(self.background, GRID_COLOR, (x * cell_size, y * cell_size, cell_size, cell_size), 1)
+        self.board = self.background.copy()
+        self.bg_pixels = pygame.surfarray.array3d(self.background)
+        # pixels of a cell that turn green when it is alive (everything but the grid line)
+        inner = np.zeros((cell_size, cell_size), dtype=bool)
+        if self.grid_lines:
+            inner[1:-1, 1:-1] = True
+        else:
+            inner[:] = True
+        self.inner = np.tile(inner, (cols, rows))
+        self.shown = np.zeros((rows, cols), dtype=np.uint8)
+
+    def _cell_rect(self, x, y):
+        cs = self.cell_size
+        rect = pygame.Rect(x * cs, y * cs, cs, cs)
+        return rect.inflate(-2, -2) if self.grid_lines else rect
+
+    # only the changed parts go on to the target, unless full. returns the rects of the target that changed
+    def draw(self, grid, target, full=False):
+        changed_y, changed_x = np.nonzero(grid != self.shown)
+        rects = []
+        if len(changed_x) > FULL_REDRAW_FRACTION * grid.size or self.cell_size < MIN_GRID_LINE_CELL:
+            if len(changed_x):
+                cs = self.cell_size
+                alive = np.repeat(np.repeat(grid.T.astype(bool), cs, axis=0), cs, axis=1) & self.inner
+                pixels = self.bg_pixels.copy()
+                pixels[alive] = ALIVE_COLOR
+                pygame.surfarray.blit_array(self.board, pixels)
+                # the box around the changes
+                x0, y0 = int(changed_x.min()), int(changed_y.min())
+                rects = [pygame.Rect(x0 * cs, y0 * cs, (int(changed_x.max()) - x0 + 1) * cs, (int(changed_y.max()) - y0 + 1) * cs)]
+        else:
+            for x, y in zip(changed_x.tolist(), changed_y.tolist()):
+                rect = self._cell_rect(x, y)
+                if grid[y, x]:
+                    self.board.fill(ALIVE_COLOR, rect)
+                else:
+                    self.board.blit(self.background, rect, rect)
+                rects.append(rect)
+        self.shown = grid.copy()
+        if full:
+            return [target.blit(self.board, (0, 0))]
+        for rect in rects:
+            target.blit(self.board, rect, rect)
+        return rects
+
+renderers = {}
+# the renderer whose board is on the screen, and the text drawn over it last frame
+shown_renderer = None
+overlays = []
+
+# returns the rects of the screen that changed, the text from last frame is covered back up with the board
+# so it can be drawn again on top. a different renderer (zoom, U) puts its whole board up once
 def draw_grid():
-    for y in range(ROWS):
-        for x in range(COLS):
-            rect = pygame.Rect(x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE)
-            if grid[y][x] == 1:
-                pygame.draw.rect(screen, ALIVE_COLOR, rect)
-            pygame.draw.rect(screen, GRID_COLOR, rect, 1)
+    global shown_renderer
+    rows, cols = grid.shape
+    renderer = renderers.get((rows, cols, cell_size))
+    if renderer is None:
+        renderer = renderers[(rows, cols, cell_size)] = GridRenderer(rows, cols, cell_size)
+    rects = renderer.draw(grid, screen, full=renderer is not shown_renderer)
+    shown_renderer = renderer
+    for rect in overlays:
+        screen.blit(renderer.board, rect, rect)
+    return rects + overlays
+
+# returns the rects the text went into
 def draw_stat():
     if menu:
-        return
-    alive_count = sum(sum(row) for row in grid)
+        return []
+    alive_count = universe.population() if unbounded else int(grid.sum())
     stat_text = f"Alive Cells: {alive_count} | Press SPACE to {'Pause' if running else 'Start'}"
     img = font.render(stat_text, True, TEXT_COLOR)
-    screen.blit(img, (10, 20))
+    rects = [screen.blit(img, (10, 20))]
     # num of itterations
     itter_text = f"Iterations: {itter_count}"
     img2 = font.render(itter_text, True, TEXT_COLOR)
-    screen.blit(img2, (10, 40))
+    rects.append(screen.blit(img2, (10, 40)))
+    return rects
 
-def count_neighbors(x, y):
-    total = 0
-    for dy in (-1, 0, 1):
-        for dx in (-1, 0, 1):
-            if dx == 0 and dy == 0:
-                continue
-            nx, ny = x + dx, y + dy
-            if 0 <= nx < COLS and 0 <= ny < ROWS:
-                total += grid[ny][nx]
-    return total
+# one generation for the whole board at once. neighbour counts are the sum of the 8 shifted
+# views of a zero padded copy, so cells past the edge count as dead like before
+# works on a stack of boards too (the last two axes are the board)
+def life_step(grid):
+    p = np.pad(grid, [(0, 0)] * (grid.ndim - 2) + [(1, 1), (1, 1)])
+    neighbors = (p[..., :-2, :-2] + p[..., :-2, 1:-1] + p[..., :-2, 2:] +
+                 p[..., 1:-1, :-2] +                    p[..., 1:-1, 2:] +
+                 p[..., 2:, :-2] + p[..., 2:, 1:-1] + p[..., 2:, 2:])
+    return ((neighbors == 3) | ((neighbors == 2) & (grid == 1))).astype(np.uint8)
 
 def update_grid():
     global grid
-    new_grid = create_grid()
-    for y in range(ROWS):
-        for x in range(COLS):
-            neighbors = count_neighbors(x, y)
-            if grid[y][x] == 1:
-                if neighbors in (2, 3):
-                    new_grid[y][x] = 1
+    if unbounded:
+        universe.step()
+        grid = view_window()
+    else:
+        grid = life_step(grid)
+
+# bit packed fixed board, 64 cells per uint64 word. J uses it to run the bounded board many
+# generations at once (hashlife only does the unbounded plane), and it stays quick at 10k x 10k.
+# cell (y, x) is bit x % 64 of word bits[y, x // 64]. a generation is a few dozen whole array
+# bitwise ops: the 8 neighbour bitplanes are summed with full adders and only the low 3 bits
+# of the count are kept (8 neighbours wraps to 0, which is dead either way)
+ONE = np.uint64(1)
+TOP_BIT = np.uint64(63)
+
+def _full_add(a, b, c):
+    t = a ^ b
+    return t ^ c, (a & b) | (t & c)
+
+class PackedLife:
+    def __init__(self, rows, cols):
+        self.rows = rows
+        self.cols = cols
+        self.words = (cols + 63) // 64
+        self.bits = np.zeros((rows, self.words), dtype=np.uint64)
+        # clears the unused bits at the end of each row so nothing grows past the right edge
+        self.last_mask = np.uint64((1 << (cols - 64 * (self.words - 1))) - 1)
+
+    @classmethod
+    def from_grid(cls, grid):
+        rows, cols = grid.shape
+        board = cls(rows, cols)
+        packed = np.packbits(grid.astype(bool), axis=1, bitorder="little")
+        buf = np.zeros((rows, board.words * 8), dtype=np.uint8)
+        buf[:, :packed.shape[1]] = packed
+        board.bits = buf.view("<u8").astype(np.uint64)
+        return board
+
+    def to_grid(self):
+        as_bytes = self.bits.astype("<u8").view(np.uint8)
+        return np.unpackbits(as_bytes, axis=1, bitorder="little")[:, :self.cols]
+
+    def population(self):
+        return int(np.unpackbits(self.bits.view(np.uint8)).sum())
+
+    def step(self, generations=1):
+        for _ in range(generations):
+            self.bits = self._next(self.bits)
+
+    def _next(self, b):
+        # the board, and the board shifted one cell west and east (carrying the bit that crosses
+        # a word boundary), each with a zero row above and below so rows can be sliced up and down
+        rows = b.shape[0]
+        mid = np.zeros((rows + 2, self.words), dtype=np.uint64)
+        mid[1:-1] = b
+        west = mid << ONE
+        west[:, 1:] |= mid[:, :-1] >> TOP_BIT
+        east = mid >> ONE
+        east[:, :-1] |= mid[:, 1:] << TOP_BIT
+
+        s_a, c_a = _full_add(west[1:-1], east[1:-1], mid[:-2])
+        s_b, c_b = _full_add(west[:-2], east[:-2], mid[2:])
+        s_c, c_c = west[2:] ^ east[2:], west[2:] & east[2:]
+        bit0, c_d = _full_add(s_a, s_b, s_c)
+        t, c_e = _full_add(c_a, c_b, c_c)
+        bit1, c_f = t ^ c_d, t & c_d
+        bit2 = c_e ^ c_f
+        # alive next generation with exactly 3 neighbours, or 2 and already alive
+        nxt = bit1 & ~bit2 & (bit0 | b)
+        nxt[:, -1] &= self.last_mask
+        return nxt
+
+# hashlife for fast forwarding huge numbers of generations on an unbounded universe
+# the universe is a quadtree. nodes are hash consed (two nodes with the same four children are
+# the same object) so repeated regions are stored once, and each node memoizes its centre
+# 2^j generations ahead, so repeated work in time is only ever done once as well
+class Node:
+    __slots__ = ("nw", "ne", "sw", "se", "level", "pop", "result")
+
+    def __init__(self, nw, ne, sw, se, level, pop):
+        self.nw, self.ne, self.sw, self.se = nw, ne, sw, se
+        self.level = level  # the node covers 2^level x 2^level cells
+        self.pop = pop
+        self.result = None  # step j -> centre node 2^j generations later
+
+class HashLife:
+    def __init__(self, max_nodes=HASHLIFE_MAX_NODES):
+        self.max_nodes = max_nodes
+        self.off = Node(None, None, None, None, 0, 0)
+        self.on = Node(None, None, None, None, 0, 1)
+        self.table = {}
+        self.empties = [self.off]
+        self.root = self.empty(3)
+        # cell coordinates of the root's top left corner
+        self.x0 = self.y0 = 0
+
+    # the canonical node with these children
+    def join(self, nw, ne, sw, se):
+        key = (nw, ne, sw, se)
+        node = self.table.get(key)
+        if node is None:
+            node = Node(nw, ne, sw, se, nw.level + 1, nw.pop + ne.pop + sw.pop + se.pop)
+            self.table[key] = node
+        return node
+
+    def empty(self, level):
+        while len(self.empties) <= level:
+            e = self.empties[-1]
+            self.empties.append(self.join(e, e, e, e))
+        return self.empties[level]
+
+    def centre(self, node):
+        return self.join(node.nw.se, node.ne.sw, node.sw.ne, node.se.nw)
+
+    # same cells, one level up with an empty border around them
+    def expand(self, node):
+        e = self.empty(node.level - 1)
+        return self.join(self.join(e, e, e, node.nw), self.join(e, e, node.ne, e),
+                         self.join(e, node.sw, e, e), self.join(node.se, e, e, e))
+
+    def _build(self, cells, level):
+        if level == 0:
+            return self.on if cells[0, 0] else self.off
+        if not cells.any():
+            return self.empty(level)
+        h = 1 << (level - 1)
+        return self.join(self._build(cells[:h, :h], level - 1), self._build(cells[:h, h:], level - 1),
+                         self._build(cells[h:, :h], level - 1), self._build(cells[h:, h:], level - 1))
+
+    def _write(self, node, x, y, out):
+        size = 1 << node.level
+        if node.pop == 0 or x >= out.shape[1] or y >= out.shape[0] or x + size <= 0 or y + size <= 0:
+            return
+        if node.level == 0:
+            out[y, x] = 1
+            return
+        h = size >> 1
+        self._write(node.nw, x, y, out)
+        self._write(node.ne, x + h, y, out)
+        self._write(node.sw, x, y + h, out)
+        self._write(node.se, x + h, y + h, out)
+
+    # load live cells given as coordinate arrays, without going through a dense grid
+    def load_cells(self, xs, ys):
+        if len(xs) == 0:
+            self.root = self.empty(3)
+            self.x0 = self.y0 = 0
+            return
+        self.x0, self.y0 = int(xs.min()), int(ys.min())
+        xs, ys = xs - self.x0, ys - self.y0
+        level = max(3, int(max(xs.max(), ys.max())).bit_length())
+        self.root = self._build_cells(xs, ys, level)
+
+    def _build_cells(self, xs, ys, level):
+        if len(xs) == 0:
+            return self.empty(level)
+        # small nodes are quicker to build from a dense block
+        if level <= 6:
+            size = 1 << level
+            cells = np.zeros((size, size), dtype=np.uint8)
+            cells[ys, xs] = 1
+            return self._build(cells, level)
+        h = 1 << (level - 1)
+        right, bottom = xs >= h, ys >= h
+        quads = []
+        for sel, dx, dy in ((~right & ~bottom, 0, 0), (right & ~bottom, h, 0), (~right & bottom, 0, h), (right & bottom, h, h)):
+            quads.append(self._build_cells(xs[sel] - dx, ys[sel] - dy, level - 1))
+        return self.join(*quads)
+
+    # coordinate arrays of every live cell
+    def live_cells(self):
+        parts = []
+        self._collect(self.root, self.x0, self.y0, parts)
+        if not parts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+    def _collect(self, node, x, y, parts):
+        if node.pop == 0:
+            return
+        if node.level <= 6:
+            size = 1 << node.level
+            cells = np.zeros((size, size), dtype=np.uint8)
+            self._write(node, 0, 0, cells)
+            ys, xs = np.nonzero(cells)
+            parts.append((xs.astype(np.int64) + x, ys.astype(np.int64) + y))
+            return
+        h = 1 << (node.level - 1)
+        self._collect(node.nw, x, y, parts)
+        self._collect(node.ne, x + h, y, parts)
+        self._collect(node.sw, x, y + h, parts)
+        self._collect(node.se, x + h, y + h, parts)
+
+    def population(self):
+        return self.root.pop
+
+    # a 4x4 node one generation on, the centre 2x2 is all that is known for sure
+    def _base(self, node):
+        cells = [[0] * 4 for _ in range(4)]
+        for y, x, q in ((0, 0, node.nw), (0, 2, node.ne), (2, 0, node.sw), (2, 2, node.se)):
+            cells[y][x], cells[y][x + 1] = q.nw.pop, q.ne.pop
+            cells[y + 1][x], cells[y + 1][x + 1] = q.sw.pop, q.se.pop
+        def rule(y, x):
+            n = sum(cells[y + dy][x + dx] for dy in (-1, 0, 1) for dx in (-1, 0, 1)) - cells[y][x]
+            return self.on if n == 3 or (n == 2 and cells[y][x]) else self.off
+        return self.join(rule(1, 1), rule(1, 2), rule(2, 1), rule(2, 2))
+
+    # centre of a level k node 2^j generations later (j <= k - 2), memoized on the node
+    def successor(self, node, j):
+        if node.pop == 0:
+            return self.empty(node.level - 1)
+        if node.result is not None and j in node.result:
+            return node.result[j]
+        k = node.level
+        if k == 2:
+            res = self._base(node)
+        else:
+            nw, ne, sw, se = node.nw, node.ne, node.sw, node.se
+            # nine overlapping sub-squares of half the size
+            parts = [nw, self.join(nw.ne, ne.nw, nw.se, ne.sw), ne,
+                     self.join(nw.sw, nw.se, sw.nw, sw.ne), self.centre(node), self.join(ne.sw, ne.se, se.nw, se.ne),
+                     sw, self.join(sw.ne, se.nw, sw.se, se.sw), se]
+            if j == k - 2:
+                # full speed, two half steps of 2^(k-3)
+                c = [self.successor(p, k - 3) for p in parts]
+                j2 = k - 3
             else:
-                if neighbors == 3:
-                    new_grid[y][x] = 1
-    grid = new_grid
+                c = [self.centre(p) for p in parts]
+                j2 = j
+            res = self.join(self.successor(self.join(c[0], c[1], c[3], c[4]), j2),
+                            self.successor(self.join(c[1], c[2], c[4], c[5]), j2),
+                            self.successor(self.join(c[3], c[4], c[6], c[7]), j2),
+                            self.successor(self.join(c[4], c[5], c[7], c[8]), j2))
+        if node.result is None:
+            node.result = {}
+        node.result[j] = res
+        return res
 
-while True:
-    screen.fill(BG_COLOR)
+    # true when every live cell is in the centre quarter of the node
+    def _padded(self, node):
+        return node.level >= 3 and self.centre(node).pop == node.pop
+
+    # advance the whole universe 2^j generations
+    def _step(self, j):
+        while self.root.level < j + 2 or not self._padded(self.root):
+            self._grow()
+        x0, y0 = self.x0, self.y0
+        self.root = self.successor(self.expand(self.root), j)
+        self.x0, self.y0 = x0, y0
+        # drop empty border so the tree stays as small as the pattern
+        while self.root.level > 3:
+            centre = self.centre(self.root)
+            if centre.pop != self.root.pop or not self._padded(centre):
+                break
+            self._shrink()
+        if len(self.table) > self.max_nodes:
+            self.collect()
+
+    def _grow(self):
+        half = 1 << (self.root.level - 1)
+        self.root = self.expand(self.root)
+        self.x0 -= half
+        self.y0 -= half
+
+    def _shrink(self):
+        quarter = 1 << (self.root.level - 2)
+        self.root = self.centre(self.root)
+        self.x0 += quarter
+        self.y0 += quarter
 
+    # jump any number of generations, one power of two per set bit
+    def advance(self, generations):
+        j = 0
+        while generations:
+            if generations & 1:
+                self._step(j)
+            generations >>= 1
+            j += 1
+
+    # garbage collection: keep only the nodes reachable from the root and forget all memoized
+    # results, which is what keeps memory bounded on long runs
+    def collect(self):
+        old = self.table
+        self.table = {}
+        seen = set()
+        stack = [self.root] + self.empties
+        while stack:
+            node = stack.pop()
+            if node.level == 0 or id(node) in seen:
+                continue
+            seen.add(id(node))
+            node.result = None
+            self.table[(node.nw, node.ne, node.sw, node.se)] = node
+            stack.extend((node.nw, node.ne, node.sw, node.se))
+        old.clear()
+
+# sparse universe with no edges. the plane is cut into CHUNK x CHUNK blocks and only blocks
+# that hold live cells are stored. a block can only change if it or one of its neighbours
+# changed last generation, so only those are stepped and the work per generation follows the
+# activity instead of the area
+class SparseLife:
+    def __init__(self, chunk=CHUNK):
+        self.chunk = chunk
+        self.chunks = {}  # (cx, cy) -> chunk x chunk uint8 array
+        self.active = set()  # chunks that changed in the last generation
+
+    def clear(self):
+        self.chunks.clear()
+        self.active.clear()
+
+    def population(self):
+        return int(sum(int(c.sum()) for c in self.chunks.values()))
+
+    def get_cell(self, x, y):
+        c = self.chunk
+        block = self.chunks.get((x // c, y // c))
+        return 0 if block is None else int(block[y % c, x % c])
+
+    def set_cell(self, x, y, value):
+        c = self.chunk
+        key = (x // c, y // c)
+        block = self.chunks.get(key)
+        if block is None:
+            if not value:
+                return
+            block = self.chunks[key] = np.zeros((c, c), dtype=np.uint8)
+        block[y % c, x % c] = value
+        self.active.add(key)
+        if not value and not block.any():
+            del self.chunks[key]
+
+    # replace everything with the live cells of a grid placed at (x0, y0)
+    def load_grid(self, grid, x0=0, y0=0):
+        ys, xs = np.nonzero(grid)
+        self.load_cells(xs + x0, ys + y0)
+
+    def load_cells(self, xs, ys):
+        self.clear()
+        if len(xs) == 0:
+            return
+        c = self.chunk
+        xs, ys = np.asarray(xs, dtype=np.int64), np.asarray(ys, dtype=np.int64)
+        keys, inverse = np.unique(np.stack([xs // c, ys // c], axis=1), axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        for i, (cx, cy) in enumerate(keys):
+            sel = inverse == i
+            block = np.zeros((c, c), dtype=np.uint8)
+            block[ys[sel] % c, xs[sel] % c] = 1
+            key = (int(cx), int(cy))
+            self.chunks[key] = block
+            self.active.add(key)
+
+    def live_cells(self):
+        xs, ys = [], []
+        for (cx, cy), block in self.chunks.items():
+            by, bx = np.nonzero(block)
+            xs.append(bx.astype(np.int64) + cx * self.chunk)
+            ys.append(by.astype(np.int64) + cy * self.chunk)
+        if not xs:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.concatenate(xs), np.concatenate(ys)
+
+    # the rows x cols window with its top left cell at (x0, y0)
+    def window(self, x0, y0, rows, cols):
+        c = self.chunk
+        out = np.zeros((rows, cols), dtype=np.uint8)
+        for cy in range(y0 // c, (y0 + rows - 1) // c + 1):
+            for cx in range(x0 // c, (x0 + cols - 1) // c + 1):
+                block = self.chunks.get((cx, cy))
+                if block is None:
+                    continue
+                # overlap of the chunk and the window in cell coordinates
+                ax, ay = max(cx * c, x0), max(cy * c, y0)
+                bx, by = min((cx + 1) * c, x0 + cols), min((cy + 1) * c, y0 + rows)
+                out[ay - y0:by - y0, ax - x0:bx - x0] = block[ay - cy * c:by - cy * c, ax - cx * c:bx - cx * c]
+        return out
+
+    # writes grid into the window with its top left cell at (x0, y0), everything outside the window stays
+    def set_window(self, grid, x0=0, y0=0):
+        c = self.chunk
+        rows, cols = grid.shape
+        for cy in range(y0 // c, (y0 + rows - 1) // c + 1):
+            for cx in range(x0 // c, (x0 + cols - 1) // c + 1):
+                ax, ay = max(cx * c, x0), max(cy * c, y0)
+                bx, by = min((cx + 1) * c, x0 + cols), min((cy + 1) * c, y0 + rows)
+                part = grid[ay - y0:by - y0, ax - x0:bx - x0]
+                key = (cx, cy)
+                block = self.chunks.get(key)
+                if block is None:
+                    if not part.any():
+                        continue
+                    block = self.chunks[key] = np.zeros((c, c), dtype=np.uint8)
+                block[ay - cy * c:by - cy * c, ax - cx * c:bx - cx * c] = part
+                self.active.add(key)
+                if not block.any():
+                    del self.chunks[key]
+
+    # a chunk with a one cell border taken from its neighbours
+    def _padded(self, key):
+        c = self.chunk
+        cx, cy = key
+        out = np.zeros((c + 2, c + 2), dtype=np.uint8)
+        get = self.chunks.get
+        block = get(key)
+        if block is not None:
+            out[1:-1, 1:-1] = block
+        for dx, dy, dst, src in ((0, -1, (0, slice(1, -1)), (-1, slice(None))),
+                                 (0, 1, (-1, slice(1, -1)), (0, slice(None))),
+                                 (-1, 0, (slice(1, -1), 0), (slice(None), -1)),
+                                 (1, 0, (slice(1, -1), -1), (slice(None), 0)),
+                                 (-1, -1, (0, 0), (-1, -1)), (1, -1, (0, -1), (-1, 0)),
+                                 (-1, 1, (-1, 0), (0, -1)), (1, 1, (-1, -1), (0, 0))):
+            n = get((cx + dx, cy + dy))
+            if n is not None:
+                out[dst] = n[src]
+        return out
+
+    def step(self):
+        # everything that changed last time plus its neighbours, stepped as one stack
+        todo = {(cx + dx, cy + dy) for cx, cy in self.active for dx in (-1, 0, 1) for dy in (-1, 0, 1)}
+        todo = [key for key in todo if key in self.chunks or self._near_live(key)]
+        self.active = set()
+        if not todo:
+            return
+        nxt = life_step(np.stack([self._padded(key) for key in todo]))[:, 1:-1, 1:-1]
+        for key, block in zip(todo, nxt):
+            old = self.chunks.get(key)
+            alive = block.any()
+            if old is None:
+                if alive:
+                    # a copy, a view would keep this generation's whole stack alive
+                    self.chunks[key] = block.copy()
+                    self.active.add(key)
+            elif not np.array_equal(old, block):
+                self.active.add(key)
+                if alive:
+                    self.chunks[key] = block.copy()
+                else:
+                    del self.chunks[key]
+
+    # an empty chunk can only come alive if a neighbour holds cells
+    def _near_live(self, key):
+        cx, cy = key
+        return any((cx + dx, cy + dy) in self.chunks for dx in (-1, 0, 1) for dy in (-1, 0, 1))
+
+# pattern files. both readers go through the file a line at a time and collect the live cells
+# straight into int arrays, so big patterns never turn into lists of tuples
+RLE_TOKEN = re.compile(r"(\d*)([A-Za-z.$!])")
+
+def read_rle(f):
+    xs, ys = array("q"), array("q")
+    x = y = 0
+    for line in f:
+        line = line.strip()
+        if not line or line.startswith("#") or line.startswith("x"):
+            continue  # comments and the "x = 3, y = 3, rule = B3/S23" header
+        for count, tag in RLE_TOKEN.findall(line):
+            n = int(count) if count else 1
+            if tag == "!":
+                return xs, ys
+            if tag == "$":
+                x, y = 0, y + n
+                continue
+            if tag not in "b.":  # o, or any state of a multistate pattern
+                xs.extend(range(x, x + n))
+                ys.extend(repeat(y, n))
+            x += n
+    return xs, ys
+
+def read_plaintext(f):
+    xs, ys = array("q"), array("q")
+    y = 0
+    for line in f:
+        if line.startswith("!"):
+            continue
+        for x, ch in enumerate(line.rstrip()):
+            if ch in "O*":
+                xs.append(x)
+                ys.append(y)
+        y += 1
+    return xs, ys
+
+# live cells of a pattern file, moved so the pattern starts at (0, 0)
+def read_pattern(path):
+    with open(path) as f:
+        xs, ys = read_plaintext(f) if path.endswith((".cells", ".txt")) else read_rle(f)
+    xs, ys = np.frombuffer(xs, dtype=np.int64), np.frombuffer(ys, dtype=np.int64)
+    if len(xs):
+        xs, ys = xs - xs.min(), ys - ys.min()
+    return xs, ys
+
+# the live cells as runs: sorted row by row, a new run starts wherever a row changes or x skips
+def cell_runs(xs, ys):
+    order = np.lexsort((xs, ys))
+    xs, ys = xs[order] - xs.min(), ys[order] - ys.min()
+    starts = np.flatnonzero(np.r_[True, (ys[1:] != ys[:-1]) | (xs[1:] != xs[:-1] + 1)])
+    lengths = np.diff(np.r_[starts, len(xs)])
+    return xs[starts], ys[starts], lengths
+
+def write_rle(f, xs, ys):
+    width = int(xs.max() - xs.min()) + 1 if len(xs) else 0
+    height = int(ys.max() - ys.min()) + 1 if len(ys) else 0
+    f.write(f"x = {width}, y = {height}, rule = B3/S23\n")
+    line = ""
+    def put(n, tag):
+        nonlocal line
+        token = f"{n}{tag}" if n > 1 else tag
+        if len(line) + len(token) > 70:
+            f.write(line + "\n")
+            line = ""
+        line += token
+    x = y = 0
+    if len(xs):
+        for rx, ry, n in zip(*(a.tolist() for a in cell_runs(xs, ys))):
+            if ry != y:
+                put(ry - y, "$")
+                x, y = 0, ry
+            if rx != x:
+                put(rx - x, "b")
+            put(n, "o")
+            x = rx + n
+    put(1, "!")
+    f.write(line + "\n")
+
+def write_plaintext(f, xs, ys):
+    f.write("!Name: game-of-life.py\n")
+    if not len(xs):
+        return
+    x = y = 0
+    for rx, ry, n in zip(*(a.tolist() for a in cell_runs(xs, ys))):
+        if ry != y:
+            f.write("\n" * (ry - y))
+            x, y = 0, ry
+        f.write("." * (rx - x) + "O" * n)
+        x = rx + n
+    f.write("\n")
+
+def write_pattern(path, xs, ys):
+    xs, ys = np.asarray(xs, dtype=np.int64), np.asarray(ys, dtype=np.int64)
+    with open(path, "w") as f:
+        if path.endswith((".cells", ".txt")):
+            write_plaintext(f, xs, ys)
+        else:
+            write_rle(f, xs, ys)
+
+# checkpoints are one flat binary file: an int64 header, the top left corner of every block,
+# then the blocks themselves as uint8. it is written and read through np.memmap so a huge board
+# goes straight between the arrays and the disk
+CHECKPOINT_MAGIC = 0x4C494645  # "LIFE"
+HEADER = 6  # magic, itter_count, bounded, blocks, block rows, block cols
+
+def save_checkpoint(path, itter_count, bounded, corners, blocks):
+    n, rows, cols = blocks.shape
+    size = 8 * (HEADER + 2 * n) + blocks.size
+    tmp = path + ".tmp"
+    data = np.memmap(tmp, dtype=np.uint8, mode="w+", shape=(size,))
+    data[:8 * HEADER].view(np.int64)[:] = (CHECKPOINT_MAGIC, itter_count, bounded, n, rows, cols)
+    data[8 * HEADER:8 * (HEADER + 2 * n)].view(np.int64)[:] = np.asarray(corners, dtype=np.int64).reshape(-1)
+    data[8 * (HEADER + 2 * n):] = blocks.reshape(-1)
+    data.flush()
+    del data
+    os.replace(tmp, path)  # a crash mid write leaves the last good checkpoint alone
+
+def is_checkpoint(path):
+    with open(path, "rb") as f:
+        head = np.frombuffer(f.read(8), dtype=np.int64)
+    return len(head) == 1 and head[0] == CHECKPOINT_MAGIC
+
+# returns itter_count, bounded, (n, 2) corners and an (n, rows, cols) memmap of the blocks
+def load_checkpoint(path):
+    magic, itter_count, bounded, n, rows, cols = np.fromfile(path, dtype=np.int64, count=HEADER)
+    if magic != CHECKPOINT_MAGIC:
+        raise ValueError(f"{path} is not a game of life checkpoint")
+    corners = np.fromfile(path, dtype=np.int64, count=2 * n, offset=8 * HEADER).reshape(n, 2)
+    blocks = np.memmap(path, dtype=np.uint8, mode="r", offset=8 * (HEADER + 2 * n), shape=(n, rows, cols)) if n else np.zeros((0, rows, cols), dtype=np.uint8)
+    return int(itter_count), bool(bounded), corners, blocks
+
+hashlife = HashLife()
+universe = SparseLife()
+unbounded = True  # U toggles back to the fixed board where cells past the edge are dead
+view_x = view_y = 0  # universe cell shown in the top left corner
+cell_size = CELL_SIZE  # only changes in the unbounded view, the fixed board is always ROWS x COLS
+
+def view_window():
+    return universe.window(view_x, view_y, HEIGHT // cell_size, WIDTH // cell_size)
+
+def live_cells():
+    if unbounded:
+        return universe.live_cells()
+    ys, xs = np.nonzero(grid)
+    return xs + view_x, ys + view_y
+
+# the unbounded universe is saved chunk by chunk, the fixed board as one block
+def checkpoint():
+    if unbounded:
+        keys = list(universe.chunks)
+        corners = [(cx * universe.chunk, cy * universe.chunk) for cx, cy in keys]
+        blocks = np.array([universe.chunks[key] for key in keys], dtype=np.uint8).reshape(-1, universe.chunk, universe.chunk)
+    else:
+        corners, blocks = [(view_x, view_y)], grid[None]
+    save_checkpoint(CHECKPOINT_FILE, itter_count, not unbounded, corners, blocks)
+
+def restore(path):
+    global grid, itter_count, unbounded, view_x, view_y, cell_size
+    itter_count, bounded, corners, blocks = load_checkpoint(path)
+    if bounded and blocks.shape == (1, ROWS, COLS):
+        unbounded, cell_size = False, CELL_SIZE
+        view_x, view_y = (int(v) for v in corners[0])
+        grid = np.array(blocks[0])
+        universe.load_grid(grid, view_x, view_y)
+        return
+    xs, ys = [], []
+    for (x0, y0), block in zip(corners, blocks):
+        by, bx = np.nonzero(block)
+        xs.append(bx + x0)
+        ys.append(by + y0)
+    universe.load_cells(np.concatenate(xs or [[]]), np.concatenate(ys or [[]]))
+    unbounded = True
+    grid = view_window()
+
+# drops a pattern into the middle of the view
+def load_pattern(path):
+    global grid, itter_count
+    xs, ys = read_pattern(path)
+    rows, cols = grid.shape
+    if len(xs):
+        xs = xs + view_x + (cols - int(xs.max()) - 1) // 2
+        ys = ys + view_y + (rows - int(ys.max()) - 1) // 2
+    universe.load_cells(xs, ys)
+    grid = view_window() if unbounded else universe.window(view_x, view_y, ROWS, COLS)
+    itter_count = 0
+
+# fast forward. hashlife only knows the unbounded plane, so the fixed board (dead past its edges)
+# is stepped exactly with the bit packed board instead
+def jump_grid(generations):
+    global grid, itter_count
+    if unbounded:
+        hashlife.load_cells(*universe.live_cells())
+        hashlife.advance(generations)
+        universe.load_cells(*hashlife.live_cells())
+        grid = view_window()
+    else:
+        board = PackedLife.from_grid(grid)
+        board.step(generations)
+        grid = board.to_grid()
+    itter_count += generations
+
+# python game-of-life.py [pattern.rle | pattern.cells | life-checkpoint.bin]
+if len(sys.argv) > 1:
+    if is_checkpoint(sys.argv[1]):
+        restore(sys.argv[1])
+    else:
+        load_pattern(sys.argv[1])
+
+while True:
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
             pygame.quit()
@@ -97,21 +841,47 @@ while True:
 
         if event.type == pygame.MOUSEBUTTONDOWN and not running:
             mx, my = pygame.mouse.get_pos()
-            x = mx // CELL_SIZE
-            y = my // CELL_SIZE
+            x = mx // cell_size
+            y = my // cell_size
             # Prevent edge crash
-            if 0 <= x < COLS and 0 <= y < ROWS:
+            if 0 <= x < grid.shape[1] and 0 <= y < grid.shape[0]:
                 grid[y][x] = 1 - grid[y][x]
+                universe.set_cell(view_x + x, view_y + y, grid[y][x])
             
 
         if event.type == pygame.KEYDOWN:
             if event.key == pygame.K_SPACE:
                 running = not running
             elif event.key == pygame.K_c:
-                grid = create_grid()
+                grid = create_grid(False, *grid.shape)
+                universe.clear()
                 running = False
             elif event.key == pygame.K_r:
-                grid = create_grid(randomize=True)
+                grid = create_grid(True, *grid.shape)
+                universe.load_grid(grid, view_x, view_y)
+            elif event.key == pygame.K_u:
+                unbounded = not unbounded
+                if unbounded:
+                    # the fixed board goes back into its window, what was left outside it is still there
+                    universe.set_window(grid, view_x, view_y)
+                else:
+                    cell_size = CELL_SIZE
+                    grid = universe.window(view_x, view_y, ROWS, COLS)
+            elif event.key in (pygame.K_MINUS, pygame.K_EQUALS) and unbounded:
+                level = ZOOM_LEVELS.index(cell_size) + (1 if event.key == pygame.K_EQUALS else -1)
+                cell_size = ZOOM_LEVELS[max(0, min(len(ZOOM_LEVELS) - 1, level))]
+                grid = view_window()
+            elif event.key in (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_DOWN) and unbounded:
+                view_x += {pygame.K_LEFT: -PAN_STEP, pygame.K_RIGHT: PAN_STEP}.get(event.key, 0)
+                view_y += {pygame.K_UP: -PAN_STEP, pygame.K_DOWN: PAN_STEP}.get(event.key, 0)
+                grid = view_window()
+            elif event.key == pygame.K_s:
+                write_pattern(PATTERN_FILE, *live_cells())
+            elif event.key == pygame.K_l and os.path.exists(PATTERN_FILE):
+                load_pattern(PATTERN_FILE)
+                running = False
+            elif event.key == pygame.K_j:
+                jump_grid(JUMP_GENERATIONS)
             elif event.key == pygame.K_ESCAPE:
                 pygame.quit()
                 sys.exit()
@@ -121,15 +891,19 @@ while True:
     if running:
         update_grid()
 
-    draw_grid()  # Always draw grid
-    draw_stat()  # draw info
+    rects = draw_grid()  # Always draw grid
+    overlays = draw_stat()  # draw info
 
     if menu:
         for i, text in enumerate(instructions):
             img = font.render(text, True, TEXT_COLOR)
-            screen.blit(img, (10, 10 + i * 20))
+            overlays.append(screen.blit(img, (10, 10 + i * 20)))
 
     if running:
         itter_count += 1
-    pygame.display.flip()
+        if CHECKPOINT_EVERY and itter_count % CHECKPOINT_EVERY == 0:
+            checkpoint()
+    # only what changed goes out to the display, nothing at all when the board and text stood still
+    if rects or overlays:
+        pygame.display.update(rects + overlays)
     clock.tick(FPS)
\ No newline at end of file
@@ -1,18 +1,42 @@
+import os
+import sys
+import time
+import math
+import argparse
+from collections import OrderedDict
+from decimal import Decimal, getcontext
+import multiprocessing as mp
+from multiprocessing import shared_memory
 import pygame
 import numpy as np # im using numpy for faster pixel manipulation
 
 # Window size
 WIDTH, HEIGHT = 800, 600
 
-# Initialize Pygame
-pygame.init()
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Mandelbrot Set Explorer")
-
 # Mandelbrot parameters
 max_iter = 100
+ZOOM_STEP = 1.2  # each scroll click zooms by this factor
+zoom_level = 0
 zoom = 1.0
-offset_x, offset_y = 0.0, 0.0
+offset_x, offset_y = Decimal(0), Decimal(0)  # decimal so the centre stays exact at deep zooms
+
+# tiles are rendered independently by the worker pool and blitted as they finish
+TILE_SIZE = 64
+
+# finished tiles are cached so zooming back out or panning over old ground is close to free
+TILE_CACHE_BYTES = 256 * 1024 * 1024
+# set to a directory to spill evicted tiles to disk and keep them between runs
+TILE_CACHE_DIR = None
+
+# past this zoom complex128 pixel coordinates start to collide, so pixels are computed as float64
+# offsets from one high precision reference orbit instead (perturbation). the offsets themselves
+# are plain floats, which holds up to a zoom of roughly 1e300
+DEEP_ZOOM = 1e10
+# skipping iterations with the series stops before its third order term could move a pixel by more
+# than this fraction of the pixel spacing
+SERIES_TOLERANCE = 1e-3
+# the skip is checked against SERIES_PROBES x SERIES_PROBES pixels spread over the view, iterated in full
+SERIES_PROBES = 5
 
 # Color function
 def mandelbrot(c, max_iter):
@@ -23,83 +47,616 @@ def mandelbrot(c, max_iter):
         z = z*z + c
     return max_iter
 
-# Function to draw the Mandelbrot set
-# optimized with vectorized numpy operations for better performance so its not a slideshow
-# Virtual resolution lower for speed. still looks good
-V_WIDTH, V_HEIGHT = 300, 150  # half of the screen resolution
+# complex coordinates of the pixel centres in a rectangle of a width x height view
+# the view spans 3/zoom horizontally and 2/zoom vertically around the offset
+def pixel_coords(x0, y0, w, h, width, height, zoom, offset_x, offset_y):
+    re = offset_x - 1.5 / zoom + (np.arange(x0, x0 + w) + 0.5) * (3.0 / (zoom * width))
+    im = offset_y - 1.0 / zoom + (np.arange(y0, y0 + h) + 0.5) * (2.0 / (zoom * height))
+    return re[np.newaxis, :] + 1j * im[:, np.newaxis]
+
+# two orbit points closer than this (squared) mean the orbit has settled into a cycle
+PERIOD_EPS = 1e-28
 
-def draw_mandelbrot():
-    global screen, zoom, offset_x, offset_y
+# points inside the main cardioid or the period 2 bulb never escape, no need to iterate them
+def in_main_bulbs(C):
+    x, y = C.real, C.imag
+    y2 = y * y
+    q = (x - 0.25) ** 2 + y2
+    return (q * (q + (x - 0.25)) <= 0.25 * y2) | ((x + 1) ** 2 + y2 <= 0.0625)
 
-    # Create a smaller grid
-    x = np.linspace(-1.5 / zoom + offset_x, 1.5 / zoom + offset_x, V_WIDTH)
-    y = np.linspace(-1.0 / zoom + offset_y, 1.0 / zoom + offset_y, V_HEIGHT)
-    X, Y = np.meshgrid(x, y)
-    C = X + 1j * Y
-    Z = np.zeros_like(C)
-    M = np.full(C.shape, max_iter, dtype=int)
+# vectorized escape time for a grid of points, points that never escape get max_iter
+# only the points still iterating are kept, so each pass costs O(survivors) instead of O(pixels)
+def escape_time(C, max_iter):
+    M = np.full(C.shape, max_iter, dtype=np.int32)
+    out = M.reshape(-1)
+    c = C.reshape(-1)
 
-    mask = np.full(C.shape, True, dtype=bool)
+    idx = np.flatnonzero(~in_main_bulbs(c))
+    c = c[idx]
+    z = np.zeros_like(c)
+    # periodicity check (brent), compare against an orbit point saved at power of two steps
+    saved = z.copy()
+    next_save = 8
 
     for i in range(max_iter):
-        Z[mask] = Z[mask]*Z[mask] + C[mask]
-        mask, old_mask = abs(Z) <= 2, mask
-        M[mask ^ old_mask] = i
+        z = z*z + c
+        zr, zi = z.real, z.imag
+        escaped = zr*zr + zi*zi > 4
+        if escaped.any():
+            out[idx[escaped]] = i
+        dr, di = zr - saved.real, zi - saved.imag
+        # periodic points are inside the set and keep max_iter
+        done = escaped | (dr*dr + di*di < PERIOD_EPS)
+        if done.any():
+            keep = ~done
+            idx, c, z, saved = idx[keep], c[keep], z[keep], saved[keep]
+            if idx.size == 0:
+                break
+        if i == next_save:
+            saved = z.copy()
+            next_save *= 2
+    return M
+
+# decimal digits needed to hold the view centre to well below a pixel
+def set_precision(zoom):
+    getcontext().prec = max(28, int(math.log10(max(zoom, 1.0))) + 20)
+
+# orbit of the reference point c_re + i c_im, iterated in decimal and stored as complex128
+# stops once the reference escapes, perturbed pixels rebase onto the start of the orbit after that
+def reference_orbit(c_re, c_im, max_iter):
+    zr = zi = Decimal(0)
+    orbit = [0j]
+    for _ in range(max_iter):
+        zr, zi = zr * zr - zi * zi + c_re, 2 * zr * zi + c_im
+        z = complex(float(zr), float(zi))
+        orbit.append(z)
+        if z.real * z.real + z.imag * z.imag > 4:
+            break
+    return np.array(orbit)
+
+# series approximation dz_n ~ A dc + B dc^2 + C dc^3 along the reference orbit
+# coefficients for every iteration that can be skipped for offsets up to radius, the list index is
+# the skip. it ends once |C| r^3 reaches tolerance, an absolute distance well below a pixel, the
+# terms dropped after C are smaller still while C is that small
+def series_approximation(orbit, radius, max_iter, tolerance):
+    A = B = C = 0j
+    coeffs = [(A, B, C)]
+    r3 = radius ** 3
+    while len(coeffs) <= min(max_iter, len(orbit) - 2):
+        Z = orbit[len(coeffs) - 1]
+        A, B, C = 2 * Z * A + 1, 2 * Z * B + A * A, 2 * Z * C + 2 * A * B
+        if not all(map(np.isfinite, (A, B, C))) or abs(C) * r3 > tolerance:
+            break
+        coeffs.append((A, B, C))
+    return coeffs
 
-    pixels = 255 - (M * 255 // max_iter)
-    # can be modified to use a color palette instead of grayscale if desired
-    rgb_array = np.stack([pixels]*3, axis=-1).astype(np.uint8)
+# offsets of a grid of probe pixels over the w x h pixels starting at relative pixel (gx0, gy0), corners included
+def probe_offsets(gx0, gy0, w, h, width, height, zoom, fx=0.0, fy=0.0):
+    dre = (np.linspace(gx0, gx0 + w - 1, SERIES_PROBES) + fx) * (3.0 / (zoom * width))
+    dim = (np.linspace(gy0, gy0 + h - 1, SERIES_PROBES) + fy) * (2.0 / (zoom * height))
+    return dre[np.newaxis, :] + 1j * dim[:, np.newaxis]
 
+# how many iterations to skip and the coefficients there, for pixels spaced spacing apart within the
+# probes. the bound on the series isn't a guarantee, so the skip is halved until the probes escape
+# at the same iteration as when they are iterated in full
+def series_skip(orbit, probes, spacing, max_iter):
+    coeffs = series_approximation(orbit, float(np.abs(probes).max()), max_iter, SERIES_TOLERANCE * spacing)
+    full = perturbation_escape(probes, orbit, max_iter)
+    skip = len(coeffs) - 1
+    while skip and not np.array_equal(perturbation_escape(probes, orbit, max_iter, skip, coeffs[skip]), full):
+        skip //= 2
+    return skip, coeffs[skip]
+
+# escape time of the points reference + dc, iterating dz_{n+1} = 2 Z_n dz_n + dz_n^2 + dc
+# when the full value gets smaller than dz (or the reference runs out) the pixel rebases onto
+# the start of the orbit, which keeps glitches away without a second reference
+def perturbation_escape(dc, orbit, max_iter, skip=0, coeffs=(0j, 0j, 0j)):
+    M = np.full(dc.shape, max_iter, dtype=np.int32)
+    out = M.reshape(-1)
+    dc = dc.reshape(-1)
+    idx = np.arange(dc.size)
+    A, B, C = coeffs
+    dz = ((C * dc + B) * dc + A) * dc
+    ref = np.full(dc.size, skip, dtype=np.intp)
+    last = len(orbit) - 1
+
+    for i in range(skip, max_iter):
+        dz = (2 * orbit[ref] + dz) * dz + dc
+        ref += 1
+        z = orbit[ref] + dz
+        zr, zi = z.real, z.imag
+        mag = zr*zr + zi*zi
+        escaped = mag > 4
+        if escaped.any():
+            out[idx[escaped]] = i
+            keep = ~escaped
+            idx, dc, dz, ref, z, mag = idx[keep], dc[keep], dz[keep], ref[keep], z[keep], mag[keep]
+            if idx.size == 0:
+                break
+        dr, di = dz.real, dz.imag
+        rebase = (mag < dr*dr + di*di) | (ref == last)
+        if rebase.any():
+            dz[rebase] = z[rebase]
+            ref[rebase] = 0
+    return M
+
+# pixel offsets from the reference pixel (gx, gy are relative global pixel indices)
+# fx, fy shift every pixel by a fraction of a pixel, for views that don't sit on the pixel grid
+def offset_coords(gx0, gy0, w, h, width, height, zoom, fx=0.0, fy=0.0):
+    dre = (np.arange(gx0, gx0 + w) + fx) * (3.0 / (zoom * width))
+    dim = (np.arange(gy0, gy0 + h) + fy) * (2.0 / (zoom * height))
+    return dre[np.newaxis, :] + 1j * dim[:, np.newaxis]
+
+# can be modified to use a color palette instead of grayscale if desired
+def colorize(M, max_iter):
+    pixels = (255 - (M.astype(np.int64) * 255 // max_iter)).astype(np.uint8)
     # Transpose for Pygame
-    rgb_array = np.transpose(rgb_array, (1, 0, 2))
-
-    # Scale up to the actual screen size
-    surface = pygame.surfarray.make_surface(rgb_array)
-    surface = pygame.transform.smoothscale(surface, (WIDTH, HEIGHT))
-
-    screen.blit(surface, (0, 0))
-    pygame.display.flip()
-# Main loop and flag variables
-running = True
-dragging = False
-last_mouse_pos = None
-needs_redraw = True
-
-while running:
-    if needs_redraw:
-        draw_mandelbrot()
-        needs_redraw = False
-
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-
-        elif event.type == pygame.MOUSEBUTTONDOWN:
-            if event.button in [4, 5]:  # scroll zoom
-                zoom *= 1.2 if event.button == 4 else 1 / 1.2
-                needs_redraw = True
-            elif event.button == 1:
-                dragging = True
-                last_mouse_pos = event.pos
+    return np.stack([pixels.T]*3, axis=-1)
+
+# tiles of the explorer are anchored to the plane, not the screen, so the same tile shows up again
+# after a pan. global pixel (gx, gy) at a given zoom is centred on ((gx + 0.5) * 3 / (zoom * width), ...)
+def tile_coords(tx, ty, tile_size, width, height, zoom):
+    # with the offset at 1.5 / zoom the left edge of pixel_coords lands exactly on 0
+    return pixel_coords(tx * tile_size, ty * tile_size, tile_size, tile_size, width, height, zoom, 1.5 / zoom, 1.0 / zoom)
+
+# global pixel of the top left screen pixel, snapped to whole pixels (or the exact decimal position)
+# done in decimal, at deep zooms these are far bigger than a float can count exactly
+def view_origin(width, height, zoom, offset_x, offset_y, snap=True):
+    z = Decimal(zoom)
+    x, y = (Decimal(offset_x) * z - Decimal("1.5")) * width / 3, (Decimal(offset_y) * z - 1) * height / 2
+    if not snap:
+        return x, y
+    return int(x.to_integral_value()), int(y.to_integral_value())
+
+# centre of a global pixel in decimal
+def global_pixel_centre(gx, gy, width, height, zoom):
+    z = Decimal(zoom)
+    return (gx + Decimal("0.5")) * 3 / (z * width), (gy + Decimal("0.5")) * 2 / (z * height)
+
+# worker side. each worker attaches to the shared slab once and writes its tiles straight into it
+_worker_slab_shm = None
+_worker_slab = None
+
+def _init_worker(slab_name, slab_shape):
+    global _worker_slab_shm, _worker_slab
+    _worker_slab_shm = shared_memory.SharedMemory(name=slab_name)
+    _worker_slab = np.ndarray(slab_shape, dtype=np.int32, buffer=_worker_slab_shm.buf)
+
+def _render_slot(task):
+    slot, tx, ty, width, height, zoom, max_iter, deep = task
+    T = _worker_slab.shape[1]
+    if deep is None:
+        _worker_slab[slot] = escape_time(tile_coords(tx, ty, T, width, height, zoom), max_iter)
+    else:
+        ref_x, ref_y, orbit, skip, coeffs = deep
+        dc = offset_coords(tx * T - ref_x, ty * T - ref_y, T, T, width, height, zoom)
+        _worker_slab[slot] = perturbation_escape(dc, orbit, max_iter, skip, coeffs)
+    return slot, tx, ty
+
+# renders full resolution frames by farming tiles out to a process pool
+# iteration counts live in a shared memory buffer so tiles never get pickled back
+class TileRenderer:
+    def __init__(self, width, height, tile_size=TILE_SIZE, processes=None):
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.processes = processes or os.cpu_count()
+        # plane anchored tiles are computed whole into slots of this slab, one slot per tile in flight
+        self.slots = 2 * self.processes
+        slab_shape = (self.slots, tile_size, tile_size)
+        self.slab_shm = shared_memory.SharedMemory(create=True, size=self.slots * tile_size * tile_size * np.dtype(np.int32).itemsize)
+        self.slab = np.ndarray(slab_shape, dtype=np.int32, buffer=self.slab_shm.buf)
+        self.pool = mp.Pool(self.processes, initializer=_init_worker,
+                            initargs=(self.slab_shm.name, slab_shape))
+
+    # compute whole plane anchored tiles (at most self.slots of them), yields (slot, tx, ty) as they finish
+    # deep is (ref_x, ref_y, orbit, skip, coeffs) for perturbation around global pixel (ref_x, ref_y)
+    def render_tiles(self, zoom, tiles, max_iter, deep=None):
+        tasks = [(slot, tx, ty, self.width, self.height, zoom, max_iter, deep) for slot, (tx, ty) in enumerate(tiles)]
+        yield from self.pool.imap_unordered(_render_slot, tasks)
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+        del self.slab
+        self.slab_shm.close()
+        self.slab_shm.unlink()
+
+# iteration count tiles keyed by (zoom level, tx, ty, max_iter), least recently used tiles are
+# evicted once the memory budget is exceeded. with a spill directory evicted tiles go to .npy
+# files that are memory mapped back in on a miss, so the cache also survives restarts
+class TileCache:
+    def __init__(self, max_bytes=TILE_CACHE_BYTES, spill_dir=None):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.tiles = OrderedDict()
+        self.nbytes = 0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.spill_dir, "%d_%d_%d_%d.npy" % key)
+
+    def __contains__(self, key):
+        return key in self.tiles or (self.spill_dir is not None and os.path.exists(self._path(key)))
+
+    def get(self, key):
+        tile = self.tiles.get(key)
+        if tile is not None:
+            self.tiles.move_to_end(key)
+            return tile
+        if self.spill_dir:
+            try:
+                tile = np.load(self._path(key), mmap_mode="r")
+            except (OSError, ValueError):
+                return None
+            self._insert(key, tile)
+        return tile
+
+    def put(self, key, tile):
+        if key in self.tiles:
+            self.nbytes -= self.tiles.pop(key).nbytes
+        self._insert(key, tile)
+
+    def _insert(self, key, tile):
+        self.tiles[key] = tile
+        self.nbytes += tile.nbytes
+        while self.nbytes > self.max_bytes and len(self.tiles) > 1:
+            old_key, old_tile = self.tiles.popitem(last=False)
+            self.nbytes -= old_tile.nbytes
+            self._spill(old_key, old_tile)
+
+    def _spill(self, key, tile):
+        # memory mapped tiles came from disk in the first place
+        if not self.spill_dir or isinstance(tile, np.memmap):
+            return
+        path = self._path(key)
+        tmp = path + ".tmp.npy"
+        np.save(tmp, tile)
+        os.replace(tmp, path)
+
+    # write everything still in memory to disk, call before exiting
+    def flush(self):
+        for key, tile in self.tiles.items():
+            self._spill(key, tile)
+
+# drawing for the interactive explorer. the view works in plane anchored tiles: a pan scrolls the
+# screen and only redraws tiles along the newly exposed strips, tiles already in the cache are drawn
+# straight away. a zoom shows a coarse pass and then refines a batch of tiles per frame so input
+# is never blocked for long
+COARSE_STEP = 4
+
+def clip_rect(rect, width, height):
+    x0, y0, w, h = rect
+    x1, y1 = min(x0 + w, width), min(y0 + h, height)
+    x0, y0 = max(x0, 0), max(y0, 0)
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return x0, y0, x1 - x0, y1 - y0
+
+class ProgressiveView:
+    def __init__(self, renderer, surface, cache):
+        self.renderer = renderer
+        self.surface = surface
+        self.cache = cache
+        self.pending = []  # (tx, ty) tiles still to draw
+        self.level = self.zoom = self.max_iter = None
+        self.origin = (0, 0)
+        self.deep = None  # perturbation reference when zoomed past DEEP_ZOOM
+
+    # tiles covering a screen rectangle, centre of the screen first
+    def _tiles_in(self, x0, y0, w, h):
+        T = self.renderer.tile_size
+        px0, py0 = self.origin
+        tiles = [(tx, ty)
+                 for ty in range((py0 + y0) // T, (py0 + y0 + h - 1) // T + 1)
+                 for tx in range((px0 + x0) // T, (px0 + x0 + w - 1) // T + 1)]
+        # relative to the origin, the global indices can be too big for a float
+        cx = self.renderer.width / 2 - T / 2
+        cy = self.renderer.height / 2 - T / 2
+        tiles.sort(key=lambda t: (t[0] * T - px0 - cx) ** 2 + (t[1] * T - py0 - cy) ** 2)
+        return tiles
 
-        elif event.type == pygame.MOUSEBUTTONUP:
-            if event.button == 1:
-                dragging = False
-
-        elif event.type == pygame.MOUSEMOTION and dragging:
-            dx = event.pos[0] - last_mouse_pos[0]
-            dy = event.pos[1] - last_mouse_pos[1]
-            offset_x -= dx / (0.5 * zoom * WIDTH) * 1.5
-            offset_y -= dy / (0.5 * zoom * HEIGHT)
-            last_mouse_pos = event.pos
-            needs_redraw = True
-        elif event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_ESCAPE:
+    # new reference orbit at the screen centre, with the series approximation for the tiles around it
+    def _set_reference(self):
+        width, height, T = self.renderer.width, self.renderer.height, self.renderer.tile_size
+        ref_x = self.origin[0] + width // 2
+        ref_y = self.origin[1] + height // 2
+        orbit = reference_orbit(*global_pixel_centre(ref_x, ref_y, width, height, self.zoom), self.max_iter)
+        # the tiles reach up to a tile past the screen on every side
+        probes = probe_offsets(-(width // 2) - T, -(height // 2) - T, width + 2 * T, height + 2 * T, width, height, self.zoom)
+        skip, coeffs = series_skip(orbit, probes, 3.0 / (self.zoom * width), self.max_iter)
+        self.deep = (ref_x, ref_y, orbit, skip, coeffs)
+
+    def _key(self, tile):
+        return (self.level, tile[0], tile[1], self.max_iter)
+
+    # start over for a new zoom level (or iteration count), coarse preview first unless it is all cached
+    def reset(self, level, zoom, offset_x, offset_y, max_iter):
+        self.level, self.zoom, self.max_iter = level, zoom, max_iter
+        width, height = self.renderer.width, self.renderer.height
+        self.origin = view_origin(width, height, zoom, offset_x, offset_y)
+        self.pending = self._tiles_in(0, 0, width, height)
+        self.deep = None
+        if all(self._key(t) in self.cache for t in self.pending):
+            return
+        cw, ch = max(1, width // COARSE_STEP), max(1, height // COARSE_STEP)
+        if zoom > DEEP_ZOOM:
+            self._set_reference()
+            ref_x, ref_y, orbit, skip, coeffs = self.deep
+            # every COARSE_STEP-th pixel, relative to the reference
+            dc = offset_coords((self.origin[0] - ref_x) / COARSE_STEP, (self.origin[1] - ref_y) / COARSE_STEP,
+                               cw, ch, cw, ch, zoom)
+            M = perturbation_escape(dc, orbit, max_iter)
+        else:
+            M = escape_time(pixel_coords(0, 0, cw, ch, cw, ch, zoom, float(offset_x), float(offset_y)), max_iter)
+        coarse = pygame.surfarray.make_surface(colorize(M, max_iter))
+        self.surface.blit(pygame.transform.scale(coarse, (width, height)), (0, 0))
+        pygame.display.flip()
+
+    # move the view by whole pixels, everything still on screen is kept
+    def pan(self, dx, dy):
+        width, height = self.renderer.width, self.renderer.height
+        self.origin = (self.origin[0] - dx, self.origin[1] - dy)
+        self.surface.scroll(dx, dy)
+
+        # tiles along the exposed strips go first so the edge being dragged in fills right away
+        fresh = []
+        if dx:
+            fresh += self._tiles_in(0 if dx > 0 else max(width + dx, 0), 0, min(abs(dx), width), height)
+        if dy:
+            fresh += self._tiles_in(0, 0 if dy > 0 else max(height + dy, 0), width, min(abs(dy), height))
+        visible = set(self._tiles_in(0, 0, width, height))
+        queued = set(fresh)
+        self.pending = fresh + [t for t in self.pending if t in visible and t not in queued]
+        # the series skip was sized for the old view, move the reference along once it drifts away
+        if self.deep is not None:
+            ref_x, ref_y = self.deep[:2]
+            if abs(self.origin[0] + width // 2 - ref_x) > width // 4 or abs(self.origin[1] + height // 2 - ref_y) > height // 4:
+                self._set_reference()
+        pygame.display.flip()
+
+    # copy the visible part of a finished tile to the screen
+    def _draw_tile(self, tile, counts):
+        T = self.renderer.tile_size
+        x0 = tile[0] * T - self.origin[0]
+        y0 = tile[1] * T - self.origin[1]
+        rect = clip_rect((x0, y0, T, T), self.renderer.width, self.renderer.height)
+        if rect is None:
+            return None
+        sx, sy, w, h = rect
+        part = counts[sy - y0:sy - y0 + h, sx - x0:sx - x0 + w]
+        self.surface.blit(pygame.surfarray.make_surface(colorize(part, self.max_iter)), (sx, sy))
+        return rect
+
+    # draw one batch of pending tiles, returns True while there is more to do
+    # cached tiles are drawn right away and don't count against the batch
+    def step(self):
+        if not self.pending:
+            return False
+        dirty = []
+        misses = []
+        while self.pending and len(misses) < self.renderer.slots:
+            tile = self.pending.pop(0)
+            counts = self.cache.get(self._key(tile))
+            if counts is None:
+                misses.append(tile)
+            else:
+                dirty.append(self._draw_tile(tile, counts))
+        if misses and self.deep is None and self.zoom > DEEP_ZOOM:
+            self._set_reference()
+        for slot, tx, ty in self.renderer.render_tiles(self.zoom, misses, self.max_iter, self.deep):
+            counts = self.renderer.slab[slot].copy()
+            self.cache.put(self._key((tx, ty)), counts)
+            dirty.append(self._draw_tile((tx, ty), counts))
+        pygame.display.update([r for r in dirty if r is not None])
+        return bool(self.pending)
+
+# headless rendering, no window needed. a viewport is (centre_x, centre_y, zoom) with the same
+# 3/zoom by 2/zoom extent as the explorer, centres can be Decimals (or strings) for deep zooms
+# frames are rendered in horizontal strips so a 4k frame doesn't need gigabytes of temporaries
+STRIP_ROWS = 128
+
+def render_view(width, height, centre_x, centre_y, zoom, max_iter):
+    centre_x, centre_y = Decimal(centre_x), Decimal(centre_y)
+    M = np.empty((height, width), dtype=np.int32)
+    if zoom <= DEEP_ZOOM:
+        for y0 in range(0, height, STRIP_ROWS):
+            h = min(STRIP_ROWS, height - y0)
+            C = pixel_coords(0, y0, width, h, width, height, zoom, float(centre_x), float(centre_y))
+            M[y0:y0 + h] = escape_time(C, max_iter)
+        return M
+
+    set_precision(zoom)
+    # the reference sits on a whole global pixel, the frame keeps its sub-pixel position in the offsets
+    # so the frames of a zoom_path glide instead of jumping from pixel to pixel
+    x, y = view_origin(width, height, zoom, centre_x, centre_y, snap=False)
+    ox, oy = int(x.to_integral_value()), int(y.to_integral_value())
+    fx, fy = float(x - ox), float(y - oy)
+    ref_x, ref_y = ox + width // 2, oy + height // 2
+    orbit = reference_orbit(*global_pixel_centre(ref_x, ref_y, width, height, zoom), max_iter)
+    probes = probe_offsets(ox - ref_x, oy - ref_y, width, height, width, height, zoom, fx, fy)
+    skip, coeffs = series_skip(orbit, probes, 3.0 / (zoom * width), max_iter)
+    for y0 in range(0, height, STRIP_ROWS):
+        h = min(STRIP_ROWS, height - y0)
+        dc = offset_coords(ox - ref_x, oy + y0 - ref_y, width, h, width, height, zoom, fx, fy)
+        M[y0:y0 + h] = perturbation_escape(dc, orbit, max_iter, skip, coeffs)
+    return M
+
+# frames of a zoom from one viewport to another. the zoom is interpolated geometrically and the
+# end centre slides linearly across the screen, so the target stays in view the whole way
+def zoom_path(start, end, frames):
+    (sx, sy, sz), (ex, ey, ez) = start, end
+    sx, sy, ex, ey = map(Decimal, (sx, sy, ex, ey))
+    set_precision(max(sz, ez))
+    path = []
+    for i in range(frames):
+        t = i / (frames - 1) if frames > 1 else 1.0
+        z = sz * (ez / sz) ** t
+        k = Decimal(sz / z * (1 - t))
+        path.append((ex + (sx - ex) * k, ey + (sy - ey) * k, z))
+    return path
+
+def frame_path(out_dir, index, fmt):
+    return os.path.join(out_dir, "frame_%05d.%s" % (index, fmt))
+
+# save iteration counts as a png, or as a raw .npy of the counts for later colouring
+def save_frame(path, M, max_iter):
+    if path.endswith(".npy"):
+        tmp = path[:-4] + ".tmp.npy"
+        np.save(tmp, M)
+    else:
+        tmp = path + ".tmp.png"
+        pygame.image.save(pygame.surfarray.make_surface(colorize(M, max_iter)), tmp)
+    # rename once it is complete so an interrupted run never leaves a half written frame
+    os.replace(tmp, path)
+
+def _render_frame(task):
+    index, view, width, height, max_iter, path = task
+    save_frame(path, render_view(width, height, *view, max_iter), max_iter)
+    return index
+
+# render every viewport to out_dir, frames are spread over the workers and each one is written
+# as soon as it is done. existing frames are skipped so an interrupted batch can just be rerun
+def render_batch(views, out_dir, width, height, max_iter, fmt="png", processes=None, log=sys.stderr):
+    os.makedirs(out_dir, exist_ok=True)
+    tasks = [(i, view, width, height, max_iter, frame_path(out_dir, i, fmt))
+             for i, view in enumerate(views) if not os.path.exists(frame_path(out_dir, i, fmt))]
+    processes = min(processes or os.cpu_count(), max(len(tasks), 1))
+    start = time.time()
+    pool = mp.Pool(processes) if processes != 1 else None
+    # a failed render or save (or ctrl-c) stops the other workers too
+    try:
+        done = pool.imap_unordered(_render_frame, tasks) if pool else map(_render_frame, tasks)
+        for n, index in enumerate(done, 1):
+            elapsed = time.time() - start
+            log.write("frame %d done (%d/%d, %.2f frames/s)\n" % (index, n, len(tasks), n / max(elapsed, 1e-9)))
+    finally:
+        if pool:
+            pool.terminate()
+            pool.join()
+
+def parse_size(text):
+    w, h = text.lower().split("x")
+    return int(w), int(h)
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Mandelbrot set explorer, run without arguments for the window")
+    sub = parser.add_subparsers(dest="command", required=True)
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--out", required=True, help="output directory")
+    common.add_argument("--size", type=parse_size, default=(WIDTH, HEIGHT), help="frame size, e.g. 3840x2160")
+    common.add_argument("--max-iter", type=int, default=max_iter)
+    common.add_argument("--format", choices=["png", "npy"], default="png", help="png image or raw iteration counts")
+    common.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+
+    render = sub.add_parser("render", parents=[common], help="render a list of viewports")
+    render.add_argument("--view", nargs=3, action="append", required=True, metavar=("X", "Y", "ZOOM"),
+                        help="centre and zoom of a frame, can be given several times")
+
+    anim = sub.add_parser("zoom", parents=[common], help="render an interpolated zoom")
+    anim.add_argument("--start", nargs=3, default=["0", "0", "1"], metavar=("X", "Y", "ZOOM"))
+    anim.add_argument("--end", nargs=3, required=True, metavar=("X", "Y", "ZOOM"))
+    anim.add_argument("--frames", type=int, default=300)
+    return parser.parse_args(argv)
+
+def view_arg(values):
+    x, y, z = values
+    return Decimal(x), Decimal(y), float(z)
+
+def cli(argv):
+    args = parse_args(argv)
+    if args.command == "render":
+        views = [view_arg(v) for v in args.view]
+    else:
+        views = zoom_path(view_arg(args.start), view_arg(args.end), args.frames)
+    width, height = args.size
+    render_batch(views, args.out, width, height, args.max_iter, args.format, args.workers)
+
+def main():
+    global screen, zoom_level, zoom, offset_x, offset_y, max_iter
+
+    # start the workers before pygame, SDL's signal handlers would stop terminate() from reaching them
+    renderer = TileRenderer(WIDTH, HEIGHT)
+
+    # Initialize Pygame
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Mandelbrot Set Explorer")
+
+    spill_dir = os.path.join(TILE_CACHE_DIR, "%dx%d" % (WIDTH, HEIGHT)) if TILE_CACHE_DIR else None
+    cache = TileCache(TILE_CACHE_BYTES, spill_dir)
+    view = ProgressiveView(renderer, screen, cache)
+
+    # Main loop and flag variables
+    running = True
+    dragging = False
+    last_mouse_pos = None
+    needs_redraw = True
+
+    while running:
+        if needs_redraw:
+            view.reset(zoom_level, zoom, offset_x, offset_y, max_iter)
+            needs_redraw = False
+        # refine a batch of tiles per frame, sleep when the image is complete
+        if not view.step():
+            pygame.time.wait(10)
+
+        # drags are summed over the frame and applied as one whole pixel shift
+        pan_dx = pan_dy = 0
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
                 running = False
-            elif event.key == pygame.K_r:
-                zoom = 1.0
-                offset_x, offset_y = 0.0, 0.0
-                needs_redraw = True
-                # reset view to default
 
-pygame.quit()
\ No newline at end of file
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                if event.button in [4, 5]:  # scroll zoom
+                    # zoom is derived from an integer level so cached tiles line up exactly
+                    zoom_level += 1 if event.button == 4 else -1
+                    zoom = ZOOM_STEP ** zoom_level
+                    set_precision(zoom)
+                    needs_redraw = True
+                elif event.button == 1:
+                    dragging = True
+                    last_mouse_pos = event.pos
+
+            elif event.type == pygame.MOUSEBUTTONUP:
+                if event.button == 1:
+                    dragging = False
+
+            elif event.type == pygame.MOUSEMOTION and dragging:
+                dx = event.pos[0] - last_mouse_pos[0]
+                dy = event.pos[1] - last_mouse_pos[1]
+                offset_x -= Decimal(dx) * 3 / (Decimal(zoom) * WIDTH)
+                offset_y -= Decimal(dy) * 2 / (Decimal(zoom) * HEIGHT)
+                last_mouse_pos = event.pos
+                pan_dx += dx
+                pan_dy += dy
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    running = False
+                elif event.key == pygame.K_r:
+                    zoom_level, zoom = 0, 1.0
+                    offset_x, offset_y = Decimal(0), Decimal(0)
+                    needs_redraw = True
+                    # reset view to default
+                # more iterations are needed to see anything at deep zooms
+                elif event.key in (pygame.K_EQUALS, pygame.K_PLUS):
+                    max_iter *= 2
+                    needs_redraw = True
+                elif event.key == pygame.K_MINUS and max_iter > 25:
+                    max_iter //= 2
+                    needs_redraw = True
+
+        if (pan_dx or pan_dy) and not needs_redraw:
+            view.pan(pan_dx, pan_dy)
+
+    cache.flush()
+    renderer.close()
+    pygame.quit()
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        cli(sys.argv[1:])
+    else:
+        main()
+
@@ -1,25 +1,64 @@
+import os
+import sys
 import math
+import time
 import random
+import argparse
+import multiprocessing as mp
+import numpy as np
 import pygame as pg
 
+# the table is stepped in fixed ticks of 1/60 s, velocities are in pixels per tick
+TICK = 1 / 60
+# every tick is split into at least this many substeps, more when something is fast,
+# so no ball moves further than MAX_TRAVEL of the smallest radius in one substep
+SUBSTEPS = 4
+MAX_TRAVEL = 0.25
+# share of the speed kept by a ball-ball hit and by a cushion bounce
+RESTITUTION = 0.95
+CUSHION_RESTITUTION = 0.8
+# slower than this (pixels per tick) counts as stopped
+REST_SPEED = 0.05
+# after a stall, advance() catches up at most this many seconds instead of running a huge burst of ticks
+MAX_CATCH_UP = 0.25
+# pockets of the 800 x 400 table as (x, y, radius)
+POCKETS = [(50, 50, 20), (400, 50, 20), (750, 50, 20), (50, 350, 20), (400, 350, 20), (750, 350, 20)]
+# a batch shot that hasn't come to rest after this many simulated seconds is stopped there
+MAX_SHOT_TIME = 60
 
+
+# a ball is a view of one row of its table's arrays, until it is added it just holds its own values
 class Ball:
     def __init__(self, x, y, radius):
-        self.x = x
-        self.y = y
+        self.table = None
+        self.index = None
+        self._state = [x, y, 0, 0]
         self.color = self.get_random_color()
         self.radius = radius
-        self.velocity_x = 0
-        self.velocity_y = 0
+
+    def _get(self, i):
+        if self.table is None:
+            return self._state[i]
+        return float(self.table.state[self.index, i])
+
+    def _set(self, i, value):
+        if self.table is None:
+            self._state[i] = value
+        else:
+            self.table.state[self.index, i] = value
+
+    x = property(lambda self: self._get(0), lambda self, v: self._set(0, v))
+    y = property(lambda self: self._get(1), lambda self, v: self._set(1, v))
+    velocity_x = property(lambda self: self._get(2), lambda self, v: self._set(2, v))
+    velocity_y = property(lambda self: self._get(3), lambda self, v: self._set(3, v))
+
     def move(self, dx, dy):
         self.x += dx
         self.y += dy
         # Keep the ball within the table boundaries
-        self.x = max(self.radius, min(self.x, 800 - self.radius))
-        self.y = max(self.radius, min(self.y, 400 - self.radius))
-    def collides_with(self, other):
-        distance = ((self.x - other.x) ** 2 + (self.y - other.y) ** 2) ** 0.5
-        return distance < self.radius + other.radius
+        width, height = (self.table.width, self.table.height) if self.table else (800, 400)
+        self.x = max(self.radius, min(self.x, width - self.radius))
+        self.y = max(self.radius, min(self.y, height - self.radius))
     def get_random_color(self):
         return (random.randint(0, 255), random.randint(0, 255), random.randint(0, 255))
     def draw(self, surface):
@@ -30,63 +69,253 @@ class Pocket:
         self.x = x
         self.y = y
         self.radius = radius
-    def contains(self, ball):
-        distance = ((self.x - ball.x) ** 2 + (self.y - ball.y) ** 2) ** 0.5
-        return distance < self.radius
     def draw(self, surface):
         pg.draw.circle(surface, (0, 0, 0), (int(self.x), int(self.y)), self.radius)
 
+# all the physics works on whole arrays: state is an (n, 4) array of x, y, velocity_x, velocity_y,
+# with the radius and mass of each ball alongside. nothing here needs pygame, so tables can be run
+# headless. balls are disks, so their mass goes with the radius squared
 class PoolTable:
     def __init__(self, width, height):
         self.width = width
         self.height = height
         self.balls = []
         self.pockets = []
-        self.friction = 0.98
+        self.friction = 0.98  # share of the speed kept per tick
         self.borders = [(0, 0, width, 0), (width, 0, width, height), (width, height, 0, height), (0, height, 0, 0)]
+        self.state = np.zeros((0, 4))
+        self.radius = np.zeros(0)
+        self.mass = np.zeros(0)
+        self.time = 0.0  # seconds simulated so far
+        self.leftover = 0.0  # real time not yet used up by a whole tick
+        self.pocketed = []  # (ball, time) in the order they went down
+
     def add_ball(self, ball):
+        ball.table, ball.index = self, len(self.balls)
+        self.state = np.vstack([self.state, [ball._state]])
+        self.radius = np.append(self.radius, ball.radius)
+        self.mass = self.radius ** 2
         self.balls.append(ball)
     def add_pocket(self, pocket):
         self.pockets.append(pocket)
-    def update(self):
-        for ball in self.balls:
-            ball.x += ball.velocity_x
-            ball.y += ball.velocity_y
-            ball.velocity_x *= self.friction
-            ball.velocity_y *= self.friction
+        self.pocket_centres = np.array([(p.x, p.y) for p in self.pockets], dtype=np.float64)
+        self.pocket_radius = np.array([p.radius for p in self.pockets], dtype=np.float64)
+
+    def clear(self):
         for ball in self.balls:
-            for other in self.balls:
-                if ball != other and ball.collides_with(other):
-                    # Handle collision (simplified)
-                    ball.move(-1, -1)  # Move back to avoid overlap
-            for pocket in self.pockets:
-                if pocket.contains(ball):
-                    self.balls.remove(ball)
+            ball._state, ball.table, ball.index = list(self.state[ball.index]), None, None
+        self.balls = []
+        self.state = np.zeros((0, 4))
+        self.radius = self.mass = np.zeros(0)
+        self.time = 0.0
+        self.leftover = 0.0
+        self.pocketed = []
+
+    # keep only the rows in keep, the ball views are renumbered to match
+    def _compact(self, keep):
+        gone = np.flatnonzero(~keep)
+        for i in gone:
+            ball = self.balls[i]
+            ball._state, ball.table, ball.index = list(self.state[i]), None, None
+            self.pocketed.append((ball, self.time))
+        self.state, self.radius, self.mass = self.state[keep], self.radius[keep], self.mass[keep]
+        self.balls = [ball for ball, k in zip(self.balls, keep) if k]
+        for i, ball in enumerate(self.balls):
+            ball.index = i
+
+    # broad phase: balls are bucketed into a grid of cells as wide as the biggest ball, so two balls
+    # can only touch if they sit in the same or neighbouring cells. each cell looks at itself and
+    # four of its neighbours, which covers every neighbouring pair exactly once. cells are numbered
+    # column by column and the balls sorted by cell, so a neighbour cell is a range found by searchsorted
+    def _pairs(self):
+        n = len(self.balls)
+        if n < 2:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        cell = 2 * self.radius.max()
+        # one spare cell around the edge, for balls pushed a little off the table
+        rows = int(self.height // cell) + 4
+        cx = np.maximum(np.floor(self.state[:, 0] / cell).astype(np.int64) + 1, 0)
+        cy = np.clip(np.floor(self.state[:, 1] / cell).astype(np.int64) + 1, 0, rows - 2)
+        order = np.argsort(cx * rows + cy, kind="stable")
+        keys = (cx * rows + cy)[order]
+        first, second = [], []
+        for dx, dy in ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1)):
+            target = keys + dx * rows + dy
+            end = np.searchsorted(keys, target, side="right")
+            # in its own cell a ball only pairs with the ones after it
+            start = np.arange(1, n + 1) if (dx, dy) == (0, 0) else np.searchsorted(keys, target, side="left")
+            count = np.maximum(end - start, 0)
+            total = int(count.sum())
+            if not total:
+                continue
+            a = np.repeat(np.arange(n), count)
+            b = np.arange(total) - np.repeat(np.cumsum(count) - count, count) + np.repeat(start, count)
+            first.append(order[a])
+            second.append(order[b])
+        if not first:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        return np.concatenate(first), np.concatenate(second)
+
+    def _substep(self, fraction):
+        pos, vel = self.state[:, :2], self.state[:, 2:]
+        pos += vel * fraction
+        r = self.radius
+
+        # narrow phase on squared distances, then an elastic impulse along the line between centres
+        # for every touching pair that is still closing in. a ball in several pairs gets the sum
+        i, j = self._pairs()
+        if len(i):
+            d = pos[j] - pos[i]
+            dist2 = (d * d).sum(axis=1)
+            reach = r[i] + r[j]
+            hit = dist2 < reach * reach
+            i, j, d, dist2, reach = i[hit], j[hit], d[hit], dist2[hit], reach[hit]
+        if len(i):
+            dist = np.sqrt(dist2)
+            normal = d / np.where(dist > 0, dist, 1)[:, None]
+            normal[dist == 0] = (1.0, 0.0)
+            inv_i, inv_j = 1 / self.mass[i], 1 / self.mass[j]
+            closing = ((vel[j] - vel[i]) * normal).sum(axis=1)
+            impulse = np.where(closing < 0, -(1 + RESTITUTION) * closing / (inv_i + inv_j), 0)
+            # push overlapping balls apart, shared out by inverse mass so it doesn't add energy
+            push = (reach - dist) / (inv_i + inv_j)
+            np.add.at(vel, i, -(impulse * inv_i)[:, None] * normal)
+            np.add.at(vel, j, (impulse * inv_j)[:, None] * normal)
+            np.add.at(pos, i, -(push * inv_i)[:, None] * normal)
+            np.add.at(pos, j, (push * inv_j)[:, None] * normal)
+
+        # cushions
+        for axis, size in ((0, self.width), (1, self.height)):
+            low, high = pos[:, axis] < r, pos[:, axis] > size - r
+            pos[low, axis] = r[low]
+            pos[high, axis] = size - r[high]
+            vel[low, axis] = np.abs(vel[low, axis]) * CUSHION_RESTITUTION
+            vel[high, axis] = -np.abs(vel[high, axis]) * CUSHION_RESTITUTION
+
+        vel *= self.friction ** fraction
+        self.time += TICK * fraction
+
+        if self.pockets:
+            dist2 = ((pos[:, None, :] - self.pocket_centres[None]) ** 2).sum(axis=2)
+            down = (dist2 < self.pocket_radius * self.pocket_radius).any(axis=1)
+            if down.any():
+                self._compact(~down)
+
+    # one fixed tick
+    def update(self):
+        if not len(self.balls):
+            self.time += TICK
+            return
+        speed = np.sqrt((self.state[:, 2:] ** 2).sum(axis=1))
+        substeps = max(SUBSTEPS, math.ceil(speed.max() / (MAX_TRAVEL * self.radius.min())))
+        for _ in range(substeps):
+            if not len(self.balls):
+                break
+            self._substep(1 / substeps)
+        slow = (self.state[:, 2:] ** 2).sum(axis=1) < REST_SPEED * REST_SPEED
+        self.state[slow, 2:] = 0
+
+    # run as many whole ticks as fit in the real time that passed, so the frame rate doesn't change the result
+    def advance(self, seconds):
+        self.leftover = min(self.leftover + seconds, MAX_CATCH_UP)
+        while self.leftover >= TICK:
+            self.update()
+            self.leftover -= TICK
+
+    def at_rest(self):
+        return not self.state[:, 2:].any()
+
     def draw(self, surface):
         surface.fill((0, 128, 0))  # Green table
         for pocket in self.pockets:
             pocket.draw(surface)
         for ball in self.balls:
             ball.draw(surface)
+# the triangle main() starts with, as ball positions and radii
+def rack(spacing=28, radius=14, width=800, height=400):
+    positions = [(200 + i * spacing, height // 2 + j * spacing - i * spacing // 2) for i in range(5) for j in range(i + 1)]
+    return np.array(positions, dtype=np.float64), np.full(len(positions), radius, dtype=np.float64)
+
+def make_table(positions, radii, width=800, height=400):
+    table = PoolTable(width, height)
+    for (x, y), radius in zip(positions, radii):
+        table.add_ball(Ball(float(x), float(y), float(radius)))
+    for pocket in POCKETS:
+        table.add_pocket(Pocket(*pocket))
+    return table
+
+# headless batch shots. a start is (positions, radii), a shot is (ball index, angle in radians, power in
+# pixels per tick). every shot is run to rest on its own table and boiled down to final positions
+# (nan once pocketed), the (ball, time) of every pocketed ball and the time to rest
+def simulate_shot(task):
+    (positions, radii), (ball, angle, power), max_time = task
+    table = make_table(positions, radii)
+    number = {id(b): i for i, b in enumerate(table.balls)}
+    table.balls[ball].velocity_x = power * math.cos(angle)
+    table.balls[ball].velocity_y = power * math.sin(angle)
+    while not table.at_rest() and table.time < max_time:
+        table.update()
+    final = np.full((len(positions), 2), np.nan, dtype=np.float32)
+    for b in table.balls:
+        final[number[id(b)]] = table.state[b.index, :2]
+    return final, [(number[id(b)], t) for b, t in table.pocketed], table.time
+
+# results come back in the order of tasks, a list of (start, shot) pairs
+def simulate_shots(tasks, max_time=MAX_SHOT_TIME, processes=None, log=sys.stderr):
+    tasks = [(start, shot, max_time) for start, shot in tasks]
+    processes = min(processes or os.cpu_count(), max(len(tasks), 1))
+    chunk = max(1, len(tasks) // (processes * 8))
+    start_time = time.time()
+    pool = mp.Pool(processes) if processes != 1 else None
+    results = []
+    # a failed shot (or ctrl-c) stops the other workers too
+    try:
+        done = pool.imap(simulate_shot, tasks, chunksize=chunk) if pool else map(simulate_shot, tasks)
+        for result in done:
+            results.append(result)
+            if len(results) % chunk == 0 or len(results) == len(tasks):
+                elapsed = max(time.time() - start_time, 1e-9)
+                log.write("%d/%d shots (%.1f shots/s)\n" % (len(results), len(tasks), len(results) / elapsed))
+    finally:
+        if pool:
+            pool.terminate()
+            pool.join()
+    return results
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Pool table, run without arguments for the window. "
+                                                 "with arguments it sweeps cue ball shots at the rack headless")
+    parser.add_argument("--angles", type=int, default=36, help="shot angles, spread evenly around the cue ball")
+    parser.add_argument("--powers", type=int, default=4, help="shot powers, spread evenly up to --max-power")
+    parser.add_argument("--max-power", type=float, default=40)
+    parser.add_argument("--max-time", type=float, default=MAX_SHOT_TIME)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--top", type=int, default=5, help="how many of the best shots to print")
+    return parser.parse_args(argv)
+
+def cli(argv):
+    args = parse_args(argv)
+    positions, radii = rack()
+    # a cue ball on the right, level with the rack
+    start = (np.vstack([positions, [600, 200]]), np.append(radii, 14))
+    cue = len(positions)
+    shots = [(cue, 2 * math.pi * a / args.angles, args.max_power * (p + 1) / args.powers)
+             for a in range(args.angles) for p in range(args.powers)]
+    results = simulate_shots([(start, shot) for shot in shots], args.max_time, args.workers)
+    ranked = sorted(zip(shots, results), key=lambda item: -len([b for b, t in item[1][1] if b != cue]))
+    for (ball, angle, power), (final, pocketed, rest) in ranked[:args.top]:
+        down = sorted(b for b, t in pocketed if b != cue)
+        print("angle %.1f  power %.1f  pocketed %s  cue down %s  rest after %.2fs"
+              % (math.degrees(angle), power, down, any(b == cue for b, t in pocketed), rest))
+
 def main():
     pg.init()
     screen = pg.display.set_mode((800, 400))
     pg.display.set_caption("Pool Game Physics Simulation")
     clock = pg.time.Clock()
-    table = PoolTable(800, 400)
     # draw pool triangle
     # start at 5 balls in the first row, then 4, 3, 2, 1
-    for i in range(5):
-        for j in range(i + 1):
-            table.add_ball(Ball(200 + i * 28, table.height // 2 + j * 28 - i * 14, 14))
-
-    table.add_pocket(Pocket(50, 50, 20))
-    table.add_pocket(Pocket(400, 50, 20))
-    table.add_pocket(Pocket(750, 50, 20))
-
-    table.add_pocket(Pocket(50, 350, 20))
-    table.add_pocket(Pocket(400, 350, 20))
-    table.add_pocket(Pocket(750, 350, 20))
+    table = make_table(*rack())
     running = True
     while running:
         for event in pg.event.get():
@@ -108,14 +337,15 @@ def main():
                         ball.velocity_y = 0
             if event.type == pg.KEYDOWN:
                 if event.key == pg.K_r:
-                    table.balls.clear()
-                    for i in range(5):
-                        for j in range(i + 1):
-                            table.add_ball(Ball(200 + i * 20, table.height // 2 + j * 20 - i * 10, 10))
-        table.update()
+                    table.clear()
+                    for (x, y), radius in zip(*rack(spacing=20, radius=10)):
+                        table.add_ball(Ball(x, y, radius))
+        table.advance(clock.tick(60) / 1000)
         table.draw(screen)
         pg.display.flip()
-        clock.tick(60)
     pg.quit()
 if __name__ == "__main__":    
-    main()
+    if len(sys.argv) > 1:
+        cli(sys.argv[1:])
+    else:
+        main()
@@ -1,6 +1,17 @@
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import tracemalloc
+from array import array
+import multiprocessing as mp
+from multiprocessing import shared_memory, resource_tracker
+import numpy as np
 import tkinter as tk
 from tkinter import ttk
-import random
 
 # algorithm generators
 # generators are used so we can go bar by bar and update the canvas after each step, instead of sorting all at once
@@ -102,6 +113,846 @@ def heap_sort(data):
         # call heapify on the reduced heap
         yield from heapify(i, 0)
 
+# the engines below are built for big inputs, their generators play the same steps one at a time
+
+# the chunks a parallel sort splits into when it is shown in the window
+VISUAL_WORKERS = 4
+# introsort hands ranges this short to insertion sort
+INSERTION_CUTOFF = 16
+# digit size of the radix sort, in bits. the generator uses 4 bit digits so the passes are easy to follow
+RADIX_BITS = 8
+VISUAL_RADIX_BITS = 4
+
+# runs several generators side by side, one step from each in turn, the way parallel workers would go
+def _interleave(generators):
+    generators = list(generators)
+    while generators:
+        for gen in list(generators):
+            try:
+                yield next(gen)
+            except StopIteration:
+                generators.remove(gen)
+
+def _chunk_bounds(n, parts):
+    return [n * i // parts for i in range(parts + 1)]
+
+# merges the sorted runs start..mid and mid..end of data
+def _merge(data, start, mid, end):
+    left = data[start:mid]
+    right = data[mid:end]
+    i = j = 0
+    for k in range(start, end):
+        if j >= len(right) or (i < len(left) and left[i] <= right[j]):
+            data[k] = left[i]
+            i += 1
+        else:
+            data[k] = right[j]
+            j += 1
+        yield k, k
+
+# every worker merge sorts its own chunk, then neighbouring runs are merged pairwise until one is left
+def parallel_merge_sort(data, workers=VISUAL_WORKERS):
+    bounds = _chunk_bounds(len(data), workers)
+    yield from _interleave(merge_sort(data, lo, hi) for lo, hi in zip(bounds, bounds[1:]))
+    while len(bounds) > 2:
+        merges = [_merge(data, bounds[i], bounds[i + 1], bounds[i + 2]) for i in range(0, len(bounds) - 2, 2)]
+        yield from _interleave(merges)
+        bounds = bounds[::2] + ([bounds[-1]] if len(bounds) % 2 == 0 else [])
+
+# splitters picked from a sample cut the values into one bucket per worker, the items are moved
+# to their bucket and then every bucket is sorted on its own
+def sample_sort(data, workers=VISUAL_WORKERS):
+    n = len(data)
+    if n < 2:
+        return
+    sample = sorted(random.sample(list(data), min(n, workers * 8)))
+    splitters = [sample[len(sample) * i // workers] for i in range(1, workers)]
+    buckets = [[] for _ in range(workers)]
+    for i, value in enumerate(data):
+        b = 0
+        while b < len(splitters) and value > splitters[b]:
+            b += 1
+        buckets[b].append(value)
+        yield i, i
+    bounds = [0]
+    for bucket in buckets:
+        bounds.append(bounds[-1] + len(bucket))
+    for k, value in enumerate(value for bucket in buckets for value in bucket):
+        data[k] = value
+        yield k, k
+    yield from _interleave(merge_sort(data, lo, hi) for lo, hi in zip(bounds, bounds[1:]))
+
+# least significant digit first, each pass is a stable counting sort on one digit
+def radix_sort(data, bits=VISUAL_RADIX_BITS):
+    if not data:
+        return
+    low = min(data)
+    span = max(data) - low
+    shift = 0
+    while span >> shift:
+        counts = [0] * (1 << bits)
+        for i, value in enumerate(data):
+            counts[((value - low) >> shift) & ((1 << bits) - 1)] += 1
+            yield i, i
+        starts = [0]
+        for c in counts[:-1]:
+            starts.append(starts[-1] + c)
+        out = [None] * len(data)
+        for value in data:
+            digit = ((value - low) >> shift) & ((1 << bits) - 1)
+            out[starts[digit]] = value
+            starts[digit] += 1
+        for k, value in enumerate(out):
+            data[k] = value
+            yield k, k
+        shift += bits
+
+# quick sort with a median of three pivot, insertion sort for short ranges, and heap sort for
+# any range that has split badly too many times, so it can't go quadratic
+def intro_sort(data):
+    def insertion(low, high):
+        for i in range(low + 1, high + 1):
+            key = data[i]
+            j = i - 1
+            while j >= low and data[j] > key:
+                yield j, j + 1
+                data[j + 1] = data[j]
+                j -= 1
+            data[j + 1] = key
+            yield j + 1, i
+
+    def heap(low, high):
+        n = high - low + 1
+        def sift(n, i):
+            while True:
+                largest = i
+                l, r = 2 * i + 1, 2 * i + 2
+                if l < n and data[low + l] > data[low + largest]:
+                    largest = l
+                if r < n and data[low + r] > data[low + largest]:
+                    largest = r
+                if largest == i:
+                    return
+                data[low + i], data[low + largest] = data[low + largest], data[low + i]
+                yield low + i, low + largest
+                i = largest
+        for i in range(n // 2 - 1, -1, -1):
+            yield from sift(n, i)
+        for i in range(n - 1, 0, -1):
+            data[low], data[low + i] = data[low + i], data[low]
+            yield low, low + i
+            yield from sift(i, 0)
+
+    def sort(low, high, depth):
+        while high - low + 1 > INSERTION_CUTOFF:
+            if depth == 0:
+                yield from heap(low, high)
+                return
+            depth -= 1
+            # median of three moved to high, then the same partition as quick_sort
+            mid = (low + high) // 2
+            for a, b in ((low, mid), (low, high), (mid, high)):
+                yield a, b
+                if data[b] < data[a]:
+                    data[a], data[b] = data[b], data[a]
+            data[mid], data[high] = data[high], data[mid]
+            yield mid, high
+            pivot = data[high]
+            i = low
+            for j in range(low, high):
+                yield j, high
+                if data[j] < pivot:
+                    data[i], data[j] = data[j], data[i]
+                    yield i, j
+                    i += 1
+            data[i], data[high] = data[high], data[i]
+            yield i, high
+            # recurse into the smaller side, loop on the bigger one
+            if i - low < high - i:
+                yield from sort(low, i - 1, depth)
+                low = i + 1
+            else:
+                yield from sort(i + 1, high, depth)
+                high = i - 1
+        yield from insertion(low, high)
+
+    if len(data) > 1:
+        yield from sort(0, len(data) - 1, 2 * int(math.log2(len(data))))
+
+# fast versions for benchmarking. same algorithms as the generators above, but they don't yield, they
+# just sort in place and return (comparisons, swaps). merge and insertion sort move items instead of
+# swapping them, for those every write into the list counts as a swap
+
+def bubble_sort_fast(data):
+    comparisons = swaps = 0
+    n = len(data)
+    for i in range(n):
+        for j in range(n - i - 1):
+            comparisons += 1
+            if data[j] > data[j + 1]:
+                data[j], data[j + 1] = data[j + 1], data[j]
+                swaps += 1
+    return comparisons, swaps
+
+def selection_sort_fast(data):
+    comparisons = swaps = 0
+    n = len(data)
+    for i in range(n):
+        min_idx = i
+        for j in range(i + 1, n):
+            comparisons += 1
+            if data[j] < data[min_idx]:
+                min_idx = j
+        data[i], data[min_idx] = data[min_idx], data[i]
+        swaps += 1
+    return comparisons, swaps
+
+def insertion_sort_fast(data):
+    comparisons = swaps = 0
+    for i in range(1, len(data)):
+        key = data[i]
+        j = i - 1
+        while j >= 0:
+            comparisons += 1
+            if data[j] <= key:
+                break
+            data[j + 1] = data[j]
+            swaps += 1
+            j -= 1
+        data[j + 1] = key
+        swaps += 1
+    return comparisons, swaps
+
+def merge_sort_fast(data, start=0, end=None):
+    if end is None:
+        end = len(data)
+    if end - start <= 1:
+        return 0, 0
+    mid = (start + end) // 2
+    left_comparisons, left_swaps = merge_sort_fast(data, start, mid)
+    right_comparisons, right_swaps = merge_sort_fast(data, mid, end)
+    comparisons = left_comparisons + right_comparisons
+    left = data[start:mid]
+    right = data[mid:end]
+    i = j = 0
+    for k in range(start, end):
+        if j >= len(right):
+            data[k] = left[i]
+            i += 1
+        elif i >= len(left):
+            data[k] = right[j]
+            j += 1
+        else:
+            comparisons += 1
+            if left[i] <= right[j]:
+                data[k] = left[i]
+                i += 1
+            else:
+                data[k] = right[j]
+                j += 1
+    return comparisons, left_swaps + right_swaps + end - start
+
+# same last element pivot as quick_sort, but with a stack of ranges instead of recursion,
+# sorted input would go n levels deep and hit the recursion limit
+def quick_sort_fast(data):
+    comparisons = swaps = 0
+    stack = [(0, len(data) - 1)]
+    while stack:
+        low, high = stack.pop()
+        if low >= high:
+            continue
+        pivot = data[high]
+        i = low
+        for j in range(low, high):
+            comparisons += 1
+            if data[j] < pivot:
+                data[i], data[j] = data[j], data[i]
+                swaps += 1
+                i += 1
+        data[i], data[high] = data[high], data[i]
+        swaps += 1
+        stack.append((i + 1, high))
+        stack.append((low, i - 1))
+    return comparisons, swaps
+
+def heap_sort_fast(data):
+    comparisons = swaps = 0
+    def sift_down(n, i):
+        nonlocal comparisons, swaps
+        while True:
+            largest = i
+            l = 2 * i + 1
+            r = 2 * i + 2
+            if l < n:
+                comparisons += 1
+                if data[l] > data[largest]:
+                    largest = l
+            if r < n:
+                comparisons += 1
+                if data[r] > data[largest]:
+                    largest = r
+            if largest == i:
+                return
+            data[i], data[largest] = data[largest], data[i]
+            swaps += 1
+            i = largest
+    n = len(data)
+    for i in range(n // 2 - 1, -1, -1):
+        sift_down(n, i)
+    for i in range(n - 1, 0, -1):
+        data[i], data[0] = data[0], data[i]
+        swaps += 1
+        sift_down(i, 0)
+    return comparisons, swaps
+
+def intro_sort_fast(data):
+    comparisons = swaps = 0
+    def insertion(low, high):
+        nonlocal comparisons, swaps
+        for i in range(low + 1, high + 1):
+            key = data[i]
+            j = i - 1
+            while j >= low:
+                comparisons += 1
+                if data[j] <= key:
+                    break
+                data[j + 1] = data[j]
+                swaps += 1
+                j -= 1
+            data[j + 1] = key
+            swaps += 1
+
+    def heap(low, high):
+        nonlocal swaps
+        n = high - low + 1
+        def sift(n, i):
+            nonlocal comparisons, swaps
+            while True:
+                largest = i
+                l, r = 2 * i + 1, 2 * i + 2
+                if l < n:
+                    comparisons += 1
+                    if data[low + l] > data[low + largest]:
+                        largest = l
+                if r < n:
+                    comparisons += 1
+                    if data[low + r] > data[low + largest]:
+                        largest = r
+                if largest == i:
+                    return
+                data[low + i], data[low + largest] = data[low + largest], data[low + i]
+                swaps += 1
+                i = largest
+        for i in range(n // 2 - 1, -1, -1):
+            sift(n, i)
+        for i in range(n - 1, 0, -1):
+            data[low], data[low + i] = data[low + i], data[low]
+            swaps += 1
+            sift(i, 0)
+
+    # same as intro_sort, with a stack of (low, high, depth) instead of recursion
+    stack = [(0, len(data) - 1, 2 * int(math.log2(len(data))) if data else 0)]
+    while stack:
+        low, high, depth = stack.pop()
+        if high - low + 1 <= INSERTION_CUTOFF:
+            insertion(low, high)
+            continue
+        if depth == 0:
+            heap(low, high)
+            continue
+        mid = (low + high) // 2
+        for a, b in ((low, mid), (low, high), (mid, high)):
+            comparisons += 1
+            if data[b] < data[a]:
+                data[a], data[b] = data[b], data[a]
+                swaps += 1
+        data[mid], data[high] = data[high], data[mid]
+        pivot = data[high]
+        i = low
+        for j in range(low, high):
+            comparisons += 1
+            if data[j] < pivot:
+                data[i], data[j] = data[j], data[i]
+                swaps += 1
+                i += 1
+        data[i], data[high] = data[high], data[i]
+        swaps += 2
+        stack.append((low, i - 1, depth - 1))
+        stack.append((i + 1, high, depth - 1))
+    return comparisons, swaps
+
+# array engines, for tens of millions of numpy keys. they return a sorted array instead of counts
+
+# lsd radix sort on int64 keys. flipping the sign bit makes the unsigned order match the signed
+# one, then each pass is a stable sort on one RADIX_BITS digit, which numpy does as a counting sort
+def radix_sort_array(keys, sorter=None):
+    keys = np.asarray(keys, dtype=np.int64)
+    unsigned = keys.view(np.uint64) ^ np.uint64(1 << 63)
+    digit_type = np.uint8 if RADIX_BITS <= 8 else np.uint16
+    mask = np.uint64((1 << RADIX_BITS) - 1)
+    # only the digits that differ anywhere need a pass
+    spread = int(np.bitwise_or.reduce(unsigned ^ unsigned[0])) if len(unsigned) else 0
+    for shift in range(0, 64, RADIX_BITS):
+        if not spread >> shift:
+            break
+        digits = ((unsigned >> np.uint64(shift)) & mask).astype(digit_type)
+        unsigned = unsigned[np.argsort(digits, kind="stable")]
+    return (unsigned ^ np.uint64(1 << 63)).view(np.int64)
+
+def _attach(name, n):
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray((n,), dtype=np.int64, buffer=shm.buf)
+
+def _sort_range(task):
+    name, n, lo, hi = task
+    shm, keys = _attach(name, n)
+    keys[lo:hi].sort()
+    del keys
+    shm.close()
+
+# where the first k items of the merge of a and b split between a and b. equal keys come from a first
+def _co_rank(k, a, b):
+    lo, hi = max(0, k - len(b)), min(k, len(a))
+    while lo < hi:
+        i = (lo + hi) // 2
+        if k - i > 0 and i < len(a) and b[k - i - 1] >= a[i]:
+            lo = i + 1
+        else:
+            hi = i
+    return lo
+
+def _merge_into(a, b, out):
+    out[np.arange(len(a)) + np.searchsorted(b, a, side="left")] = a
+    out[np.arange(len(b)) + np.searchsorted(a, b, side="right")] = b
+
+# one slice of the output of merging src[lo:mid] and src[mid:hi] into dst, so a single big merge can be split up
+def _merge_part(task):
+    src_name, dst_name, n, lo, mid, hi, k0, k1 = task
+    src_shm, src = _attach(src_name, n)
+    dst_shm, dst = _attach(dst_name, n)
+    a, b = src[lo:mid], src[mid:hi]
+    i0, i1 = _co_rank(k0, a, b), _co_rank(k1, a, b)
+    _merge_into(a[i0:i1], b[k0 - i0:k1 - i1], dst[lo + k0:lo + k1])
+    del src, dst, a, b
+    src_shm.close()
+    dst_shm.close()
+
+def _bucket_counts(task):
+    name, n, lo, hi, splitters = task
+    shm, keys = _attach(name, n)
+    counts = np.bincount(np.searchsorted(splitters, keys[lo:hi], side="right"), minlength=len(splitters) + 1)
+    del keys
+    shm.close()
+    return counts
+
+def _scatter(task):
+    src_name, dst_name, n, lo, hi, splitters, offsets = task
+    src_shm, src = _attach(src_name, n)
+    dst_shm, dst = _attach(dst_name, n)
+    chunk = src[lo:hi]
+    buckets = np.searchsorted(splitters, chunk, side="right")
+    order = np.argsort(buckets, kind="stable")
+    starts = np.concatenate([[0], np.cumsum(np.bincount(buckets, minlength=len(offsets)))])
+    moved = chunk[order]
+    for b, offset in enumerate(offsets):
+        dst[offset:offset + starts[b + 1] - starts[b]] = moved[starts[b]:starts[b + 1]]
+    del src, dst, chunk, moved
+    src_shm.close()
+    dst_shm.close()
+
+# a process pool plus two shared memory buffers the workers sort in, so the keys are never pickled.
+# the pool is kept between sorts so benchmarks don't time its start up
+class ParallelSorter:
+    def __init__(self, processes=None):
+        self.processes = processes or os.cpu_count()
+        # the workers have to share our resource tracker, one of their own would unlink the buffers when they exit
+        if os.name == "posix":
+            resource_tracker.ensure_running()
+        self.pool = mp.Pool(self.processes)
+
+    def _buffers(self, keys):
+        n = len(keys)
+        src = shared_memory.SharedMemory(create=True, size=max(n, 1) * 8)
+        dst = shared_memory.SharedMemory(create=True, size=max(n, 1) * 8)
+        np.ndarray((n,), dtype=np.int64, buffer=src.buf)[:] = keys
+        return n, src, dst
+
+    def _result(self, n, shm, *others):
+        out = np.ndarray((n,), dtype=np.int64, buffer=shm.buf).copy()
+        for s in (shm,) + others:
+            s.close()
+            s.unlink()
+        return out
+
+    # every worker sorts a chunk, then runs are merged pairwise. each merge is cut into slices by
+    # co-rank so all the workers keep busy even when only one merge is left
+    def merge_sort(self, keys):
+        n, src, dst = self._buffers(keys)
+        bounds = _chunk_bounds(n, self.processes)
+        self.pool.map(_sort_range, [(src.name, n, lo, hi) for lo, hi in zip(bounds, bounds[1:])])
+        while len(bounds) > 2:
+            tasks = []
+            pairs = len(bounds) // 2
+            for i in range(0, len(bounds) - 1, 2):
+                lo, mid = bounds[i], bounds[i + 1]
+                hi = bounds[i + 2] if i + 2 < len(bounds) else mid
+                cuts = _chunk_bounds(hi - lo, max(1, self.processes // pairs))
+                tasks += [(src.name, dst.name, n, lo, mid, hi, k0, k1) for k0, k1 in zip(cuts, cuts[1:])]
+            self.pool.map(_merge_part, tasks)
+            src, dst = dst, src
+            bounds = bounds[::2] + ([bounds[-1]] if len(bounds) % 2 == 0 else [])
+        return self._result(n, src, dst)
+
+    # splitters from a sample give one bucket per worker. workers count their chunk per bucket, every
+    # chunk then knows where its share of each bucket goes, scatters it there, and each bucket is sorted
+    def sample_sort(self, keys, oversample=64):
+        n, src, dst = self._buffers(keys)
+        parts = self.processes
+        rng = np.random.default_rng(0)
+        sample = np.sort(np.asarray(keys)[rng.integers(0, max(n, 1), size=parts * oversample)]) if n else np.zeros(0, dtype=np.int64)
+        splitters = sample[oversample::oversample][:parts - 1]
+        bounds = _chunk_bounds(n, parts)
+        chunks = list(zip(bounds, bounds[1:]))
+        counts = np.array(self.pool.map(_bucket_counts, [(src.name, n, lo, hi, splitters) for lo, hi in chunks]))
+        # offset of chunk c's part of bucket b: every item of the buckets before b, plus the earlier chunks' share of b
+        bucket_start = np.concatenate([[0], np.cumsum(counts.sum(axis=0))])
+        offsets = bucket_start[:-1] + np.cumsum(counts, axis=0) - counts
+        self.pool.map(_scatter, [(src.name, dst.name, n, lo, hi, splitters, offsets[c].tolist()) for c, (lo, hi) in enumerate(chunks)])
+        self.pool.map(_sort_range, [(dst.name, n, int(lo), int(hi)) for lo, hi in zip(bucket_start, bucket_start[1:])])
+        return self._result(n, dst, src)
+
+    def close(self):
+        self.pool.terminate()
+
+def parallel_merge_sort_array(keys, sorter):
+    return sorter.merge_sort(keys)
+
+def sample_sort_array(keys, sorter):
+    return sorter.sample_sort(keys)
+
+# name shown in the menu: (generator for the visualizer, fast version for the benchmark)
+SORTS = {
+    "Bubble Sort": (bubble_sort, bubble_sort_fast),
+    "Selection Sort": (selection_sort, selection_sort_fast),
+    "Insertion Sort": (insertion_sort, insertion_sort_fast),
+    "Merge Sort": (merge_sort, merge_sort_fast),
+    "Quick Sort": (quick_sort, quick_sort_fast),
+    "Heap Sort": (heap_sort, heap_sort_fast),
+    "Introsort": (intro_sort, intro_sort_fast),
+    "Radix Sort": (radix_sort, radix_sort_array),
+    "Parallel Merge Sort": (parallel_merge_sort, parallel_merge_sort_array),
+    "Sample Sort": (sample_sort, sample_sort_array),
+}
+# these fast versions take a numpy array and a ParallelSorter and return the sorted array,
+# they have no comparison or swap counts
+ARRAY_SORTS = {"Radix Sort", "Parallel Merge Sort", "Sample Sort"}
+
+# runs that would take quadratic time are skipped above QUADRATIC_LIMIT items. quick sort is only
+# quadratic on some inputs, its last element pivot falls over on sorted data and repeated values
+QUADRATIC = {
+    "Bubble Sort": None,
+    "Selection Sort": None,
+    "Insertion Sort": None,
+    "Quick Sort": {"sorted", "reversed", "few-unique", "nearly-sorted"},
+}
+QUADRATIC_LIMIT = 5000
+DISTRIBUTIONS = ["random", "sorted", "reversed", "few-unique", "nearly-sorted"]
+
+def make_input(distribution, n, rng):
+    if distribution == "few-unique":
+        return [rng.randrange(10) for _ in range(n)]
+    data = [rng.randrange(n * 10 + 1) for _ in range(n)]
+    if distribution == "sorted":
+        data.sort()
+    elif distribution == "reversed":
+        data.sort(reverse=True)
+    elif distribution == "nearly-sorted":
+        # sorted, then one percent of the items swapped with a random other item
+        data.sort()
+        for _ in range(max(1, n // 100) if n else 0):
+            i, j = rng.randrange(n), rng.randrange(n)
+            data[i], data[j] = data[j], data[i]
+    return data
+
+def is_quadratic(name, distribution):
+    return name in QUADRATIC and (QUADRATIC[name] is None or distribution in QUADRATIC[name])
+
+# one benchmark record. the best of repeat timed runs, then one more run under tracemalloc for the
+# peak memory, kept separate because tracing slows everything down
+def bench_one(name, distribution, n, repeat=3, memory=True, seed=0, sorter=None):
+    record = {"algorithm": name, "distribution": distribution, "n": n}
+    original = make_input(distribution, n, random.Random(seed))
+    expected = sorted(original)
+    fast = SORTS[name][1]
+    if name in ARRAY_SORTS:
+        return bench_array(record, fast, np.array(original, dtype=np.int64), np.array(expected, dtype=np.int64),
+                           repeat, memory, sorter)
+    times = []
+    for _ in range(repeat):
+        data = list(original)
+        start = time.perf_counter()
+        comparisons, swaps = fast(data)
+        times.append(time.perf_counter() - start)
+        if data != expected:
+            raise AssertionError(f"{name} did not sort {distribution} input of {n} items")
+    record.update(seconds=min(times), comparisons=comparisons, swaps=swaps)
+    if memory:
+        data = list(original)
+        tracemalloc.start()
+        fast(data)
+        record["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return record
+
+def bench_array(record, fast, original, expected, repeat, memory, sorter):
+    times = []
+    for _ in range(repeat):
+        keys = original.copy()
+        start = time.perf_counter()
+        out = fast(keys, sorter)
+        times.append(time.perf_counter() - start)
+        if not np.array_equal(out, expected):
+            raise AssertionError(f"{record['algorithm']} did not sort {record['distribution']} input of {record['n']} items")
+    record.update(seconds=min(times), comparisons=None, swaps=None, workers=sorter.processes if sorter else 1)
+    if memory:
+        tracemalloc.start()
+        fast(original.copy(), sorter)
+        # numpy reports its buffers to tracemalloc, the workers' shared memory isn't counted
+        record["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return record
+
+def run_benchmark(names, distributions, sizes, repeat=3, memory=True, quadratic_limit=QUADRATIC_LIMIT, seed=0,
+                  workers=None, log=sys.stderr):
+    records = []
+    sorter = ParallelSorter(workers) if ARRAY_SORTS.intersection(names) else None
+    for n in sizes:
+        for distribution in distributions:
+            for name in names:
+                if n > quadratic_limit and is_quadratic(name, distribution):
+                    records.append({"algorithm": name, "distribution": distribution, "n": n, "skipped": "quadratic"})
+                    continue
+                record = bench_one(name, distribution, n, repeat, memory, seed, sorter)
+                counts = " %12s comparisons %12s swaps" % (record["comparisons"], record["swaps"]) if record["comparisons"] is not None else ""
+                log.write("%-19s %-14s n=%-9d %10.4fs%s\n" % (name, distribution, n, record["seconds"], counts))
+                records.append(record)
+    if sorter:
+        sorter.close()
+    return records
+
+# "quick" or "Quick Sort" both work on the command line
+def sort_name(text):
+    for name in SORTS:
+        if text.lower() in (name.lower(), name.split()[0].lower()):
+            return name
+    raise argparse.ArgumentTypeError(f"unknown algorithm {text!r}, pick from {', '.join(SORTS)}")
+
+# the fast versions are written out by hand next to their generators, so this runs both on every
+# distribution and checks they finish with the same sorted list. returns (name, distribution, n) of the ones that don't
+def check_sorts(names=None, sizes=(0, 1, 2, 3, 17, 100, 1000), seed=0, workers=None):
+    names = names or list(SORTS)
+    sorter = ParallelSorter(workers) if ARRAY_SORTS.intersection(names) else None
+    failures = []
+    for name in names:
+        generator, fast = SORTS[name]
+        for distribution in DISTRIBUTIONS:
+            for n in sizes:
+                original = make_input(distribution, n, random.Random(seed))
+                expected = sorted(original)
+                shown = list(original)
+                for _ in generator(shown):
+                    pass
+                if name in ARRAY_SORTS:
+                    result = fast(np.array(original, dtype=np.int64), sorter).tolist()
+                else:
+                    result = list(original)
+                    fast(result)
+                if not shown == result == expected:
+                    failures.append((name, distribution, n))
+    if sorter:
+        sorter.close()
+    return failures
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Sorting algorithm visualizer, run without arguments for the window. "
+                                                 "with arguments it benchmarks the algorithms headless")
+    parser.add_argument("--algorithms", nargs="+", type=sort_name, default=list(SORTS))
+    parser.add_argument("--distributions", nargs="+", choices=DISTRIBUTIONS, default=DISTRIBUTIONS)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per record, the fastest is kept")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    parser.add_argument("--quadratic-limit", type=int, default=QUADRATIC_LIMIT,
+                        help="skip quadratic runs above this many items")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="processes for the parallel sorts (default: all cores)")
+    parser.add_argument("--out", default=None, help="write the results here as json (default: stdout)")
+    parser.add_argument("--check", action="store_true",
+                        help="only check that every generator and its fast version sort each distribution the same")
+    return parser.parse_args(argv)
+
+def cli(argv):
+    args = parse_args(argv)
+    if args.check:
+        failures = check_sorts(args.algorithms, seed=args.seed, workers=args.workers)
+        for name, distribution, n in failures:
+            print("%s on %s input of %d items: the generator and fast version disagree or don't sort" % (name, distribution, n))
+        print("%d failures" % len(failures))
+        sys.exit(1 if failures else 0)
+    records = run_benchmark(args.algorithms, args.distributions, args.sizes, args.repeat,
+                            not args.no_memory, args.quadratic_limit, args.seed, args.workers)
+    result = {"python": sys.version.split()[0], "seed": args.seed, "repeat": args.repeat, "cores": os.cpu_count(), "results": records}
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=1)
+    else:
+        json.dump(result, sys.stdout, indent=1)
+        print()
+
+# recorded traces. the generator is run to the end once, up front, on a list that logs every write,
+# so playback never has to sort again: stepping forward reapplies the new values, stepping back puts
+# the old ones back, and a snapshot every KEYFRAME_EVERY steps keeps long jumps short. on long traces
+# of big lists the snapshots are spread further apart so they stay under KEYFRAME_BYTES
+KEYFRAME_EVERY = 4096
+KEYFRAME_BYTES = 64 * 1024 * 1024
+
+class _RecordingList(list):
+    def __init__(self, data):
+        super().__init__(data)
+        self.write_index, self.write_old, self.write_new = array("i"), array("i"), array("i")
+
+    def __setitem__(self, i, value):
+        self.write_index.append(i)
+        self.write_old.append(list.__getitem__(self, i))
+        self.write_new.append(value)
+        list.__setitem__(self, i, value)
+
+class Trace:
+    def __init__(self, sort, data):
+        recording = _RecordingList(data)
+        step_i, step_j, step_end = array("i"), array("i"), array("i")
+        for i, j in sort(recording):
+            step_i.append(i)
+            step_j.append(j)
+            step_end.append(len(recording.write_index))
+        self.initial = np.array(data, dtype=np.int32)
+        self.write_index = np.frombuffer(recording.write_index, dtype=np.int32)
+        self.write_old = np.frombuffer(recording.write_old, dtype=np.int32)
+        self.write_new = np.frombuffer(recording.write_new, dtype=np.int32)
+        # step k highlights (step_i[k], step_j[k]), the first step_end[k] writes have happened by then
+        self.step_i = np.frombuffer(step_i, dtype=np.int32)
+        self.step_j = np.frombuffer(step_j, dtype=np.int32)
+        self.step_end = np.frombuffer(step_end, dtype=np.int32)
+        self.keyframe_every = max(KEYFRAME_EVERY, -(-len(self) * self.initial.nbytes // KEYFRAME_BYTES))
+        self.keyframes = []
+        state = self.initial.copy()
+        for position in range(0, len(self) + 1, self.keyframe_every):
+            _write(state, self.write_index, self.write_new, self.writes_at(position - self.keyframe_every) if position else 0, self.writes_at(position))
+            self.keyframes.append(state.copy())
+
+    def __len__(self):
+        return len(self.step_i)
+
+    # writes done once position steps have been played
+    def writes_at(self, position):
+        return int(self.step_end[position - 1]) if position > 0 else 0
+
+# applies writes start..end to state. an index written twice keeps the last value, so only the last
+# write to each index is used (fancy assignment doesn't promise an order)
+def _write(state, index, values, start, end, backwards=False):
+    index, values = index[start:end], values[start:end]
+    if backwards:
+        index, values = index[::-1], values[::-1]
+    if not len(index):
+        return
+    unique, last = np.unique(index[::-1], return_index=True)
+    state[unique] = values[len(index) - 1 - last]
+
+class TracePlayer:
+    def __init__(self, trace):
+        self.trace = trace
+        self.data = trace.initial.copy()
+        self.position = 0  # steps played so far
+
+    def seek(self, position):
+        trace = self.trace
+        position = max(0, min(len(trace), position))
+        if position >= self.position and position - self.position <= trace.keyframe_every:
+            _write(self.data, trace.write_index, trace.write_new, trace.writes_at(self.position), trace.writes_at(position))
+        elif position < self.position and self.position - position <= trace.keyframe_every:
+            _write(self.data, trace.write_index, trace.write_old, trace.writes_at(position), trace.writes_at(self.position), backwards=True)
+        else:
+            key = position // trace.keyframe_every
+            self.data = trace.keyframes[key].copy()
+            _write(self.data, trace.write_index, trace.write_new, trace.writes_at(key * trace.keyframe_every), trace.writes_at(position))
+        self.position = position
+
+    def step(self, count=1):
+        self.seek(self.position + count)
+
+    def at_end(self):
+        return self.position == len(self.trace)
+
+    # the pair the last played step was looking at
+    def highlight(self):
+        if self.position == 0:
+            return None
+        return int(self.trace.step_i[self.position - 1]), int(self.trace.step_j[self.position - 1])
+
+CANVAS_WIDTH, CANVAS_HEIGHT = 800, 400
+# a frame is never scheduled faster than this, lower speeds play more steps per frame instead
+FRAME_MS = 16
+MAX_ITEMS = 20000
+# a run is recorded in full before it plays, which for the quadratic sorts takes seconds and hundreds of
+# megabytes at a few thousand items, so they get a smaller slider
+VISUAL_QUADRATIC_LIMIT = 1000
+
+# draws the bars and keeps them, only bars whose value or colour changed since the last draw are touched.
+# up to one bar per pixel every bar is its own canvas rectangle. past that the canvas shows one
+# PhotoImage and each pixel column is painted with the bar that falls on it
+class BarRenderer:
+    def __init__(self, canvas, n):
+        self.canvas = canvas
+        self.n = n
+        self.shown = np.full(n, -1)
+        self.colors = {}
+        canvas.delete("all")
+        if n <= CANVAS_WIDTH:
+            self.image = None
+            width = CANVAS_WIDTH / n
+            outline = "black" if width >= 3 else ""
+            self.items = [canvas.create_rectangle(i * width, CANVAS_HEIGHT, (i + 1) * width, CANVAS_HEIGHT,
+                                                  fill="blue", outline=outline) for i in range(n)]
+        else:
+            self.image = tk.PhotoImage(width=CANVAS_WIDTH, height=CANVAS_HEIGHT)
+            self.image.put("white", to=(0, 0, CANVAS_WIDTH, CANVAS_HEIGHT))
+            canvas.create_image(0, 0, anchor="nw", image=self.image)
+            # bar shown in each column, and the column each bar lands in
+            self.bar_of_column = np.arange(CANVAS_WIDTH) * n // CANVAS_WIDTH
+            self.column_of_bar = np.arange(n) * CANVAS_WIDTH // n
+
+    def draw(self, values, colors):
+        values = np.asarray(values)
+        changed = set(np.flatnonzero(values != self.shown).tolist())
+        changed.update(i for i in colors.keys() | self.colors.keys() if colors.get(i) != self.colors.get(i))
+        if self.image is None:
+            width = CANVAS_WIDTH / self.n
+            for i in changed:
+                if values[i] != self.shown[i]:
+                    self.canvas.coords(self.items[i], i * width, CANVAS_HEIGHT - values[i], (i + 1) * width, CANVAS_HEIGHT)
+                if colors.get(i) != self.colors.get(i):
+                    self.canvas.itemconfig(self.items[i], fill=colors.get(i, "blue"))
+        else:
+            # a highlighted bar takes over its column, otherwise the column shows its own bar
+            columns = {int(self.column_of_bar[i]) for i in changed}
+            marked = {int(self.column_of_bar[i]): i for i in colors}
+            for c in columns:
+                i = marked.get(c, int(self.bar_of_column[c]))
+                top = CANVAS_HEIGHT - int(values[i])
+                self.image.put("white", to=(c, 0, c + 1, top))
+                self.image.put(colors.get(i, "blue"), to=(c, top, c + 1, CANVAS_HEIGHT))
+        self.shown = values.copy()
+        self.colors = dict(colors)
+
 # init gui
 class SortingVisualizer:
     def __init__(self, root):
@@ -109,8 +960,11 @@ class SortingVisualizer:
         self.root.title("Sorting Algorithm Visualizer")
 
         self.data = []
-        # current sorting algorithm generator
-        self.generator = None
+        # the recorded run being played back, how it is playing and the pending after() call
+        self.player = None
+        self.playing = False
+        self.direction = 1
+        self.after_id = None
 
         self.setup_ui()
         self.generate_data()
@@ -122,10 +976,10 @@ class SortingVisualizer:
         self.alg_var = tk.StringVar()
         self.alg_menu = ttk.Combobox(
             frame, textvariable=self.alg_var,
-            values=["Bubble Sort", "Selection Sort",
-                    "Insertion Sort", "Merge Sort", "Quick Sort", "Heap Sort"]
+            values=list(SORTS)
         )
         self.alg_menu.current(0)
+        self.alg_menu.bind("<<ComboboxSelected>>", self.limit_size)
         self.alg_menu.pack(side=tk.LEFT, padx=5)
 
         tk.Button(frame, text="Generate", command=self.generate_data).pack(side=tk.LEFT, padx=5)
@@ -137,55 +991,124 @@ class SortingVisualizer:
         self.speed.set(50)
         self.speed.pack(side=tk.LEFT, padx=5)
 
+        self.size = tk.Scale(frame, from_=10, to=self.max_items(), resolution=10,
+                             orient=tk.HORIZONTAL, label="Items")
+        self.size.set(50)
+        self.size.pack(side=tk.LEFT, padx=5)
+
+        playback = tk.Frame(self.root)
+        playback.pack()
+        tk.Button(playback, text="Play/Pause", command=self.toggle_play).pack(side=tk.LEFT, padx=5)
+        tk.Button(playback, text="Reverse", command=self.reverse).pack(side=tk.LEFT, padx=5)
+        self.steps_per_frame = tk.Scale(playback, from_=1, to=1000,
+                                        orient=tk.HORIZONTAL, label="Steps per frame")
+        self.steps_per_frame.pack(side=tk.LEFT, padx=5)
+        # dragging this seeks straight to a step
+        self.scrubber = tk.Scale(playback, from_=0, to=0, length=400, showvalue=False,
+                                 orient=tk.HORIZONTAL, label="Step", command=self.scrub)
+        self.scrubber.pack(side=tk.LEFT, padx=5)
+
         # canvas for drawing bars
-        self.canvas = tk.Canvas(self.root, width=800, height=400, bg="white")
+        self.canvas = tk.Canvas(self.root, width=CANVAS_WIDTH, height=CANVAS_HEIGHT, bg="white")
         self.canvas.pack()
+        self.renderer = None
 
     def generate_data(self):
-        self.data = [random.randint(10, 350) for _ in range(50)]
+        self.stop()
+        self.player = None
+        self.scrubber.config(to=0)
+        self.data = [random.randint(10, 350) for _ in range(self.size.get())]
+        self.renderer = BarRenderer(self.canvas, len(self.data))
         self.draw_data()
 
+    # the window's data is random values, so the benchmark's QUADRATIC table for random input says which sorts to hold back
+    def max_items(self):
+        return VISUAL_QUADRATIC_LIMIT if is_quadratic(self.alg_var.get(), "random") else MAX_ITEMS
+
+    def limit_size(self, event=None):
+        limit = self.max_items()
+        self.size.config(to=limit)
+        if self.size.get() > limit:
+            self.size.set(limit)
+        if len(self.data) > limit:
+            self.generate_data()
+
     def draw_data(self, color_positions={}):
-        self.canvas.delete("all")
-        width = 800 / len(self.data)
-        # Draw bars
-        for i, val in enumerate(self.data):
-            x0 = i * width
-            y0 = 400 - val
-            x1 = (i + 1) * width
-            y1 = 400
-            color = color_positions.get(i, "blue")
-            self.canvas.create_rectangle(x0, y0, x1, y1, fill=color)
+        self.renderer.draw(self.data, color_positions)
         self.root.update_idletasks()
 
     def start_sort(self):
         alg = self.alg_var.get()
-        if alg == "Bubble Sort":
-            self.generator = bubble_sort(self.data)
-        elif alg == "Selection Sort":
-            self.generator = selection_sort(self.data)
-        elif alg == "Insertion Sort":
-            self.generator = insertion_sort(self.data)
-        elif alg == "Merge Sort":
-            self.generator = merge_sort(self.data)
-        elif alg == "Quick Sort":
-            self.generator = quick_sort(self.data)
-        elif alg == "Heap Sort":
-            self.generator = heap_sort(self.data)
-
-        self.animate()
-
-    # animation loop. take next step from generator, update canvas, repeat until done
+        self.stop()
+        self.limit_size()
+        self.player = TracePlayer(Trace(SORTS[alg][0], np.asarray(self.data).tolist()))
+        self.scrubber.config(to=len(self.player.trace))
+        self.direction = 1
+        self.play()
+
+    def play(self):
+        self.playing = True
+        if self.after_id is None:
+            self.animate()
+
+    def stop(self):
+        self.playing = False
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+
+    def toggle_play(self):
+        if self.player is None:
+            return
+        if self.playing:
+            self.stop()
+        else:
+            # playing from the end again starts over, from the start in reverse goes back to the end
+            if self.direction > 0 and self.player.at_end():
+                self.player.seek(0)
+            elif self.direction < 0 and self.player.position == 0:
+                self.player.seek(len(self.player.trace))
+            self.play()
+
+    def reverse(self):
+        self.direction = -self.direction
+
+    def scrub(self, value):
+        if self.player is not None and int(value) != self.player.position:
+            self.player.seek(int(value))
+            self.show()
+
+    # copy the player's state to the canvas, with the pair the step looked at highlighted
+    def show(self):
+        self.data = self.player.data
+        pair = self.player.highlight()
+        finished = self.player.at_end() or pair is None
+        self.draw_data({} if finished else {pair[0]: "red", pair[1]: "green"})
+        self.scrubber.set(self.player.position)
+
+    # animation loop. play the next few recorded steps, update canvas, repeat until done
     def animate(self):
-        try:
-            i, j = next(self.generator)
-            self.draw_data({i: "red", j: "green"})
-            self.root.after(self.speed.get(), self.animate)
-        except StopIteration:
-            self.draw_data()
+        self.after_id = None
+        if not self.playing:
+            return
+        # below one frame time, wait a whole frame and play the steps that would have fitted in it
+        delay = self.speed.get()
+        steps = self.steps_per_frame.get()
+        if delay < FRAME_MS:
+            steps *= -(-FRAME_MS // delay)
+            delay = FRAME_MS
+        self.player.step(self.direction * steps)
+        self.show()
+        if self.player.at_end() or self.player.position == 0:
+            self.playing = False
+            return
+        self.after_id = self.root.after(delay, self.animate)
 
 # App entry point
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = SortingVisualizer(root)
-    root.mainloop()
\ No newline at end of file
+    if len(sys.argv) > 1:
+        cli(sys.argv[1:])
+    else:
+        root = tk.Tk()
+        app = SortingVisualizer(root)
+        root.mainloop()
\ No newline at end of file